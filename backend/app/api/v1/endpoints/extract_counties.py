@@ -21,13 +21,12 @@ def validate_xml_type(content: bytes, expected_type: str) -> bool:
         bool: True si es válido
     """
     try:
-        text_content = content.decode('utf-8', errors='ignore')
-
+        # Búsqueda directa en bytes: los marcadores son ASCII, no hace falta decodificar
         if expected_type == 'sdm':
-            return '<succession-data-model' in text_content
+            return b'<succession-data-model' in content
         elif expected_type == 'csf_sdm':
-            return ('<country-specific-fields' in text_content and
-                    '<format-group' in text_content)
+            return (b'<country-specific-fields' in content and
+                    b'<format-group' in content)
 
         return False
     except Exception:
@@ -161,11 +160,8 @@ async def extract_countries(file_id: str):
         with open(file_path, 'rb') as f:
             content = f.read()
 
-        # Decodificar contenido
-        text_content = content.decode('utf-8', errors='ignore')
-
-        # Validar que sea un CSF
-        if not ('<country-specific-fields' in text_content and '<format-group' in text_content):
+        # Validar que sea un CSF (en bytes, sin decodificar el archivo completo)
+        if not (b'<country-specific-fields' in content and b'<format-group' in content):
             raise HTTPException(
                 status_code=400,
                 detail="El archivo no es un CSF válido"
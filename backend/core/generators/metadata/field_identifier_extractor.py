@@ -1,28 +1,30 @@
 #backend/core/generators/metadata/mfield_identifier_extractor.py
 from typing import Optional, Tuple
-import re
 
 
 class FieldIdentifierExtractor:
     SPECIAL_PREFIXES = {"workPermitInfo"}  # Cambiar de "workPermit" a "workPermitInfo"
-    COUNTRY_CODE_PATTERN = re.compile(r'^([A-Z]{2,3})_(.+)$')
 
     def extract_entity_and_field(self, full_field_id: str) -> Tuple[str, str, Optional[str]]:
         country_code = None
         remaining = full_field_id
 
-        match = self.COUNTRY_CODE_PATTERN.match(full_field_id)
-        if match:
-            country_code = match.group(1)
-            remaining = match.group(2)
-
-        parts = remaining.split('_', 1)
-        if len(parts) == 2:
-            entity_id = parts[0]
-            field_id = parts[1]
+        # Prefijo de país: 2-3 mayúsculas ASCII seguidas de "_" y al menos un carácter
+        length = len(full_field_id)
+        i = 0
+        while i < 3 and i < length and "A" <= full_field_id[i] <= "Z":
+            i += 1
+        if i >= 2 and i + 1 < length and full_field_id[i] == "_":
+            country_code = full_field_id[:i]
+            remaining = full_field_id[i + 1:]
+
+        separator = remaining.find("_")
+        if separator == -1:
+            entity_id = remaining
+            field_id = remaining
         else:
-            entity_id = parts[0]
-            field_id = parts[0]
+            entity_id = remaining[:separator]
+            field_id = remaining[separator + 1:]
 
         return entity_id, field_id, country_code
 
@@ -1,11 +1,17 @@
 #backend/core/generators/metadata/metadata_generator.py
 from typing import Dict, List
+from collections import defaultdict
+from types import MappingProxyType
 import json
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from backend.core.generators.metadata.business_key_resolver import BusinessKeyResolver
 from backend.core.generators.metadata.field_identifier_extractor import FieldIdentifierExtractor
 from backend.core.generators.metadata.field_categorizer import FieldCategorizer
 
+# (segundo epoch, timestamp ISO) del último valor generado
+_timestamp_cache = (0, "")
+
 
 class MetadataGenerator:
     SAP_BUSINESS_KEYS = {
@@ -125,10 +131,17 @@ class MetadataGenerator:
         }
     }
 
+    IDENTIFIER_KEYWORDS = ("id", "code", "number")
+    DESCRIPTIVE_KEYWORDS = ("name", "title", "description")
+
     def __init__(self):
         self.key_resolver = BusinessKeyResolver()
         self.field_extractor = FieldIdentifierExtractor()
         self.field_categorizer = FieldCategorizer(self.SAP_BUSINESS_KEYS)
+        self._element_templates = {
+            element_id: self._build_element_template(element_id, sap_config)
+            for element_id, sap_config in self.SAP_BUSINESS_KEYS.items()
+        }
 
     def generate_metadata(self, processed_data: Dict, columns: List[Dict]) -> Dict:
 
@@ -168,17 +181,25 @@ class MetadataGenerator:
         element_id = element["element_id"]
         fields = element["fields"]
 
-        sap_config = self.SAP_BUSINESS_KEYS.get(element_id, {})
+        template = self._element_templates.get(element_id)
+        if template is None:
+            template = self._build_element_template(element_id, {})
+
+        # field_count ya ocupa su posición en la plantilla: se sobrescribe en el mismo orden
+        return {**template, "field_count": len(fields)}
 
-        return {
+    @staticmethod
+    def _build_element_template(element_id: str, sap_config: Dict) -> MappingProxyType:
+
+        return MappingProxyType({
             "element_id": element_id,
             "is_master": sap_config.get("is_master", False),
             "business_keys": sap_config.get("keys", []),
             "sap_format_keys": sap_config.get("sap_format", []),
             "references": sap_config.get("references"),
-            "field_count": len(fields),
+            "field_count": None,
             "description": sap_config.get("description", f"Standard {element_id} entity")
-        }
+        })
 
     def _build_field_catalog(self, columns: List[Dict], elements_meta: Dict) -> Dict:
 
@@ -254,7 +275,7 @@ class MetadataGenerator:
     ) -> Dict:
 
         config = {}
-        grouped_by_entity = {}
+        grouped_by_entity = defaultdict(list)
 
         for column in all_columns:
             full_field_id = column["full_id"]
@@ -270,9 +291,6 @@ class MetadataGenerator:
             else:
                 group_key = entity_id
 
-            if group_key not in grouped_by_entity:
-                grouped_by_entity[group_key] = []
-
             grouped_by_entity[group_key].append(full_field_id)
 
         for group_key, fields in grouped_by_entity.items():
@@ -318,20 +336,25 @@ class MetadataGenerator:
 
         field_lower = field_id.lower()
 
-        if any(k in field_lower for k in ["id", "code", "number"]):
+        if any(k in field_lower for k in self.IDENTIFIER_KEYWORDS):
             return "identifier"
         elif "date" in field_lower:
             return "temporal"
         elif "custom" in field_lower or "udf" in field_lower:
             return "custom"
-        elif any(k in field_lower for k in ["name", "title", "description"]):
+        elif any(k in field_lower for k in self.DESCRIPTIVE_KEYWORDS):
             return "descriptive"
         else:
             return "operational"
 
     def _get_timestamp(self) -> str:
 
-        return datetime.utcnow().isoformat() + 'Z'
+        global _timestamp_cache
+        now = int(time.time())
+        if now != _timestamp_cache[0]:
+            formatted = datetime.fromtimestamp(now, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+            _timestamp_cache = (now, formatted)
+        return _timestamp_cache[1]
 
     def save_metadata(self, metadata: Dict, output_path: str) -> str:
 
@@ -1,11 +1,79 @@
 from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import csv
 import json
+import multiprocessing
+import os
+import pickle
+import tempfile
 from pathlib import Path
 from backend.core.generators.metadata.business_key_resolver import BusinessKeyResolver
 from backend.core.generators.metadata.field_identifier_extractor import FieldIdentifierExtractor
 
+_DESCRIPTIVE_NAMES = {
+    "user-id": "User ID",
+    "person-id-external": "Person ID External",
+    "personInfo.person-id-external": "Person ID External",
+    "related-person-id-external": "Related Person ID External",
+    "start-date": "Start Date",
+    "end-date": "End Date",
+    "seq-number": "Sequence Number",
+    "pay-component": "Pay Component",
+    "pay-component-code": "Pay Component Code",
+    "pay-date": "Pay Date",
+    "email-address": "Email Address",
+    "phone-type": "Phone Type",
+    "card-type": "Card Type",
+    "address-type": "Address Type",
+    "country": "Country",
+    "relationship": "Relationship",
+    "relationship-type": "Relationship Type",
+    "name": "Name",
+    "domain": "Domain",
+    "document-type": "Document Type",
+    "document-number": "Document Number",
+    "issue-date": "Issue Date"
+}
+
+
+@lru_cache(maxsize=512)
+def _titleize_sap_column(sap_column: str) -> str:
+    return sap_column.replace("-", " ").title()
+
+
+# spawn y no fork: el proceso de la API tiene hilos vivos (uvicorn, pools de E/S)
+# y un fork con un lock tomado puede bloquear al worker
+_POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+@lru_cache(maxsize=1)
+def _load_worker_input(input_path: str) -> Tuple["LayoutSplitter", Dict]:
+    # Una lectura por worker: el splitter y las filas se serializan una sola
+    # vez en el padre y cada worker las lee del archivo temporal
+    with open(input_path, 'rb') as f:
+        return pickle.loads(f.read())
+
+
+def _generate_layout_in_worker(
+        input_path: str,
+        group_key: str,
+        config: Dict,
+        output_dir: Path
+) -> Optional[str]:
+    splitter, golden_data = _load_worker_input(input_path)
+    return splitter._generate_layout(
+        group_key=group_key,
+        config=config,
+        golden_data=golden_data,
+        output_dir=output_dir
+    )
+
+
 class LayoutSplitter:
+    # Por debajo de este volumen (filas x layouts) el arranque de procesos y la
+    # lectura de los datos en cada worker no compensan
+    PARALLEL_MIN_CELLS = 500_000
 
     def __init__(self, metadata_path: str):
         self.metadata = self._load_metadata(metadata_path)
@@ -27,19 +95,57 @@ class LayoutSplitter:
         output_path.mkdir(parents=True, exist_ok=True)
 
         golden_data = self._read_golden_record(golden_record_path)
-        generated_files = []
-
-        for group_key, config in self.layout_config.items():
-            layout_file = self._generate_layout(
-                group_key=group_key,
-                config=config,
-                golden_data=golden_data,
-                output_dir=output_path
+
+        group_keys = list(self.layout_config.keys())
+        configs = list(self.layout_config.values())
+        workers = min(len(group_keys), os.cpu_count() or 1)
+        volume = len(golden_data["data_rows"]) * len(group_keys)
+
+        if workers > 1 and volume >= self.PARALLEL_MIN_CELLS:
+            layout_files = self._generate_layouts_in_pool(
+                workers, group_keys, configs, golden_data, output_path
             )
-            if layout_file:
-                generated_files.append(layout_file)
+        else:
+            layout_files = [
+                self._generate_layout(
+                    group_key=group_key,
+                    config=config,
+                    golden_data=golden_data,
+                    output_dir=output_path
+                )
+                for group_key, config in zip(group_keys, configs)
+            ]
+
+        return [layout_file for layout_file in layout_files if layout_file]
 
-        return generated_files
+    def _generate_layouts_in_pool(
+            self,
+            workers: int,
+            group_keys: List[str],
+            configs: List[Dict],
+            golden_data: Dict,
+            output_dir: Path
+    ) -> List[Optional[str]]:
+
+        # Splitter y datos se escriben una vez; a los workers solo llega la ruta
+        with tempfile.TemporaryDirectory(prefix="layout_split_") as temp_dir:
+            input_path = os.path.join(temp_dir, "golden_data.pkl")
+            with open(input_path, 'wb') as f:
+                pickle.dump((self, golden_data), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=_POOL_CONTEXT,
+                    initializer=_load_worker_input,
+                    initargs=(input_path,)
+            ) as executor:
+                return list(executor.map(
+                    _generate_layout_in_worker,
+                    [input_path] * len(group_keys),
+                    group_keys,
+                    configs,
+                    [output_dir] * len(group_keys)
+                ))
 
     def _read_golden_record(self, csv_path: str) -> Dict:
 
@@ -53,9 +159,14 @@ class LayoutSplitter:
                     descriptive_header = next(reader)
                     data_rows = list(reader)
 
+                header_index = {}
+                for idx, column in enumerate(technical_header):
+                    header_index.setdefault(column, idx)
+
                 return {
                     "technical_header": technical_header,
                     "descriptive_header": descriptive_header,
+                    "header_index": header_index,
                     "data_rows": data_rows
                 }
             except (UnicodeDecodeError, UnicodeError):
@@ -119,9 +230,10 @@ class LayoutSplitter:
                 added_sap_names.add(sap_column)
 
         # PASO 2: AGREGAR CAMPOS HRIS Y RESTANTES
+        header_index = golden_data["header_index"]
         for field_id in element_fields:
-            if field_id in golden_data["technical_header"]:
-                idx = golden_data["technical_header"].index(field_id)
+            idx = header_index.get(field_id)
+            if idx is not None:
 
                 entity_id, extracted_field, country_code = self.field_extractor.extract_entity_and_field(
                     field_id
@@ -166,20 +278,51 @@ class LayoutSplitter:
             writer.writerow(technical_header)
             writer.writerow(descriptive_header)
 
-            for row in golden_data["data_rows"]:
-                output_row = []
-                for col in columns:
-                    idx = col["source_idx"]
-                    if idx is None:
-                        value = ""
-                    else:
-                        value = row[idx] if idx < len(row) else ""
-                    output_row.append(value)
+            separators = len(columns) - 1
+            project = self._build_row_projector(columns)
 
-                writer.writerow(output_row)
+            for row in golden_data["data_rows"]:
+                self._write_row(f, writer, project(row), separators)
 
         return str(layout_path)
 
+    @staticmethod
+    def _build_row_projector(columns: List[Dict]):
+        # Genera una función sin bucles ni ramas por columna para proyectar cada fila
+        cells = []
+        for col in columns:
+            idx = col["source_idx"]
+            if idx is None:
+                cells.append('""')
+            else:
+                idx = int(idx)
+                cells.append(f'row[{idx}] if {idx} < n else ""')
+
+        source = (
+            "def project(row):\n"
+            "    n = len(row)\n"
+            f"    return ({', '.join(cells)},)\n"
+        )
+        namespace = {}
+        exec(compile(source, "<layout_projector>", "exec"), namespace)
+        return namespace["project"]
+
+    @staticmethod
+    def _write_row(f, writer, values: Tuple[str, ...], separators: int) -> None:
+        # Si ningún valor requiere comillas, se escribe la fila directamente sin csv
+        line = ",".join(values)
+
+        if (
+                line.count(",") == separators
+                and '"' not in line
+                and "\n" not in line
+                and "\r" not in line
+                and (separators or line)
+        ):
+            f.write(line + "\r\n")
+        else:
+            writer.writerow(values)
+
     def _find_source_column(
             self,
             golden_column: Optional[str],
@@ -202,29 +345,4 @@ class LayoutSplitter:
         return None
 
     def _generate_descriptive_name(self, sap_column: str) -> str:
-        descriptive_map = {
-            "user-id": "User ID",
-            "person-id-external": "Person ID External",
-            "personInfo.person-id-external": "Person ID External",
-            "related-person-id-external": "Related Person ID External",
-            "start-date": "Start Date",
-            "end-date": "End Date",
-            "seq-number": "Sequence Number",
-            "pay-component": "Pay Component",
-            "pay-component-code": "Pay Component Code",
-            "pay-date": "Pay Date",
-            "email-address": "Email Address",
-            "phone-type": "Phone Type",
-            "card-type": "Card Type",
-            "address-type": "Address Type",
-            "country": "Country",
-            "relationship": "Relationship",
-            "relationship-type": "Relationship Type",
-            "name": "Name",
-            "domain": "Domain",
-            "document-type": "Document Type",
-            "document-number": "Document Number",
-            "issue-date": "Issue Date"
-        }
-
-        return descriptive_map.get(sap_column, sap_column.replace("-", " ").title())
\ No newline at end of file
+        return _DESCRIPTIVE_NAMES.get(sap_column) or _titleize_sap_column(sap_column)
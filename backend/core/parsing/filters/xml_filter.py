@@ -3,10 +3,9 @@
 Filtro para elementos XML basado en reglas específicas.
 Mantiene la estructura del árbol intacta mientras filtra nodos.
 """
-import re
-from typing import Any, Optional, List, Set
+from functools import lru_cache
+from typing import Any, Dict, Optional, List, Tuple
 
-from realtime import Dict
 from ..models.xml_elements import XMLNode, XMLDocument
 
 
@@ -15,22 +14,23 @@ class XMLFilter:
     Filtra elementos XML manteniendo estructura.
     """
     
-    # Patrones para identificar elementos HRIS
-    HRIS_ELEMENT_PATTERNS = [
-        r'^hris-.*',                    # hris-element, hris-action, etc.
-        r'.*hris.*element.*',           # cualquier cosa con "hris" y "element"
-        r'.*hris.*action.*',            # cualquier cosa con "hris" y "action"
-    ]
+    # Un elemento es HRIS si su tag contiene "hris" (hris-element, hris-action,
+    # hris-field, ...); cubre también los patrones ^hris-.*, .*hris.*element.*
+    # y .*hris.*action.*
+    HRIS_TAG_MARKER = 'hris'
     
-    # Patrones para identificar elementos a preservar incluso si no son HRIS
+    # Tags a preservar incluso si no son HRIS
     # (nodos contenedores que pueden tener hijos HRIS)
-    PRESERVE_STRUCTURE_PATTERNS = [
-        r'^succession-data-model$',     # elemento raíz
-        r'^standard-element$',          # contenedores potenciales
-        r'^custom-filters$',
-        r'^element-permission$',
-        r'^dg-filters$',
-    ]
+    PRESERVE_STRUCTURE_TAGS = frozenset({
+        'succession-data-model',        # elemento raíz
+        'standard-element',             # contenedores potenciales
+        'custom-filters',
+        'element-permission',
+        'dg-filters',
+    })
+    
+    # Atributos que marcan un nodo como HRIS
+    HRIS_INDICATORS = frozenset({'hris-type', 'hris-category', 'is-hris'})
     
     def __init__(self, filter_csf: bool = False):
         """
@@ -38,15 +38,15 @@ class XMLFilter:
             filter_csf: Si es True, aplica filtro también a documentos CSF
         """
         self.filter_csf = filter_csf
-        self._compiled_hris_patterns = [re.compile(p, re.IGNORECASE) 
-                                       for p in self.HRIS_ELEMENT_PATTERNS]
-        self._compiled_structure_patterns = [re.compile(p, re.IGNORECASE) 
-                                           for p in self.PRESERVE_STRUCTURE_PATTERNS]
     
     def filter_document(self, document: XMLDocument, file_type: str = 'main') -> XMLDocument:
         """
         Aplica filtro al documento completo.
         
+        Los documentos principales se filtran durante el parseo en streaming
+        (XMLParser.parse_document_streaming con node_filter); este método es la
+        implementación de referencia de ese resultado.
+        
         Args:
             document: Documento XML a filtrar
             file_type: Tipo de archivo ('main' o 'csf')
@@ -79,101 +79,96 @@ class XMLFilter:
         if node is None:
             return None
         
-        # 1. Si el nodo es HRIS, mantenerlo completo
-        if self._is_hris_element(node):
-            # Filtrar hijos recursivamente
-            filtered_children = []
-            for child in node.children:
-                filtered_child = self._filter_node(child)
-                if filtered_child:
-                    filtered_children.append(filtered_child)
-            
-            # Crear copia con hijos filtrados
-            filtered_node = self._create_filtered_copy(node, filtered_children)
-            return filtered_node
+        filtered_node, _ = self._filter_node_fused(node)
+        return filtered_node
+    
+    def _filter_node_fused(self, node: XMLNode) -> Tuple[Optional[XMLNode], bool]:
+        """
+        Filtra el subárbol en una sola pasada post-order iterativa.
         
-        # 2. Si el nodo es necesario para preservar estructura, mantenerlo
-        if self._should_preserve_structure(node):
-            # Filtrar hijos recursivamente
-            filtered_children = []
-            for child in node.children:
-                filtered_child = self._filter_node(child)
-                if filtered_child:
-                    filtered_children.append(filtered_child)
+        Returns:
+            (copia filtrada o None, si el subárbol contiene nodos HRIS)
+        """
+        # Pila de trabajo (nodo, hijos ya visitados) y pila de resultados por nodo.
+        # Los métodos se enlazan a locales: este bucle se ejecuta una vez por nodo.
+        # La clasificación se resuelve en línea sobre tag_lower (precalculado en el nodo)
+        hris_marker = self.HRIS_TAG_MARKER
+        hris_indicators = self.HRIS_INDICATORS
+        create_filtered_copy = self._create_filtered_copy
+        stack = [(node, False)]
+        push = stack.append
+        pop = stack.pop
+        results: List[Tuple[Optional[XMLNode], bool]] = []
+        emit = results.append
+        
+        while stack:
+            current, visited = pop()
+            children = current.children
+            
+            if children and not visited:
+                push((current, True))
+                for child in reversed(children):
+                    push((child, False))
+                continue
             
-            # Si tiene hijos después del filtrado, mantener nodo
-            if filtered_children:
-                filtered_node = self._create_filtered_copy(node, filtered_children)
-                return filtered_node
-        
-        # 3. Para otros nodos, verificar si tienen descendientes HRIS
-        hris_descendants = self._collect_hris_descendants(node)
-        if hris_descendants:
-            # Mantener nodo con estructura mínima
             filtered_children = []
-            for child in node.children:
-                filtered_child = self._filter_node(child)
-                if filtered_child:
-                    filtered_children.append(filtered_child)
+            has_hris = False
+            if children:
+                child_count = len(children)
+                for filtered_child, child_has_hris in results[-child_count:]:
+                    if filtered_child is not None:
+                        filtered_children.append(filtered_child)
+                    if child_has_hris:
+                        has_hris = True
+                del results[-child_count:]
+            
+            # 1. Si el nodo es HRIS (por tag o por atributo), mantenerlo completo
+            if hris_marker in current.tag_lower or not hris_indicators.isdisjoint(current.attributes):
+                emit((create_filtered_copy(current, filtered_children), True))
+            
+            # 2. Nodos de estructura u otros: mantenerlos solo si conservan
+            #    descendientes HRIS después del filtrado
+            elif filtered_children:
+                emit((create_filtered_copy(current, filtered_children), has_hris))
             
-            if filtered_children:
-                filtered_node = self._create_filtered_copy(node, filtered_children)
-                return filtered_node
+            # 3. Nodo no tiene descendientes HRIS, eliminarlo
+            else:
+                emit((None, False))
         
-        # 4. Nodo no tiene descendientes HRIS, eliminarlo
-        return None
+        return results[0]
+    
+    def retains(self, node: XMLNode, has_retained_children: bool) -> bool:
+        """
+        Regla de conservación de un nodo, dado si conserva algún hijo tras filtrar.
+        """
+        return has_retained_children or self._is_hris_element(node)
     
     def _is_hris_element(self, node: XMLNode) -> bool:
         """Determina si un elemento es HRIS basado en su tag."""
-        tag_lower = node.tag.lower()
-        
-        # Verificar patrones HRIS
-        for pattern in self._compiled_hris_patterns:
-            if pattern.match(tag_lower):
-                return True
-        
-        # Verificar atributos específicos
-        if 'hris' in tag_lower:
+        if self.HRIS_TAG_MARKER in node.tag_lower:
             return True
         
         # Verificar si tiene atributo que indique HRIS
-        hris_indicators = {'hris-type', 'hris-category', 'is-hris'}
-        if any(indicator in node.attributes for indicator in hris_indicators):
-            return True
-        
-        return False
+        return not self.HRIS_INDICATORS.isdisjoint(node.attributes)
     
     def _should_preserve_structure(self, node: XMLNode) -> bool:
         """Determina si un nodo debe preservarse por estructura."""
-        tag_lower = node.tag.lower()
-        
-        for pattern in self._compiled_structure_patterns:
-            if pattern.match(tag_lower):
-                return True
-        
-        return False
-    
-    def _collect_hris_descendants(self, node: XMLNode) -> List[XMLNode]:
-        """Recolecta todos los descendientes HRIS de un nodo."""
-        hris_nodes = []
-        
-        if self._is_hris_element(node):
-            hris_nodes.append(node)
-        
-        for child in node.children:
-            hris_nodes.extend(self._collect_hris_descendants(child))
-        
-        return hris_nodes
+        return node.tag_lower in self.PRESERVE_STRUCTURE_TAGS
     
     def _create_filtered_copy(self, original: XMLNode, 
                             filtered_children: List[XMLNode]) -> XMLNode:
-        """Crea una copia filtrada del nodo manteniendo metadata."""
+        """
+        Crea una copia filtrada del nodo manteniendo metadata.
+        
+        attributes y labels se comparten con el nodo original (el filtro nunca
+        los modifica); el documento filtrado reemplaza al original.
+        """
         # Crear nuevo nodo con misma metadata
         filtered_node = XMLNode(
             tag=original.tag,
             technical_id=original.technical_id,
-            attributes=original.attributes.copy(),
-            labels=original.labels.copy(),
+            attributes=original.attributes,
+            labels=original.labels,
             children=filtered_children,
             parent=None,  # Se establecerá después
             depth=original.depth,
@@ -183,49 +178,69 @@ class XMLFilter:
             node_type=original.node_type
         )
         
-        # Establecer parent en hijos
+        # Establecer parent en hijos y tamaño del subárbol (los hijos ya lo tienen)
+        subtree_size = 1
         for child in filtered_children:
             child.parent = filtered_node
+            subtree_size += child.subtree_size
+        filtered_node.subtree_size = subtree_size
         
         return filtered_node
     
     def get_filter_statistics(self, document: XMLDocument) -> Dict[str, Any]:
         """Obtiene estadísticas del filtro aplicado."""
-        original_count = self._count_nodes(document.root)
+        # Conteo total y de nodos HRIS del árbol original en un solo recorrido
+        original_count = 0
+        hris_count = 0
+        hris_tags = set()
+        stack = [document.root]
+        while stack:
+            node = stack.pop()
+            original_count += 1
+            if self._is_hris_element(node):
+                hris_count += 1
+                hris_tags.add(node.tag)
+            stack.extend(node.children)
+        
         filtered_root = self._filter_node(document.root)
         filtered_count = self._count_nodes(filtered_root) if filtered_root else 0
         
-        hris_nodes = self._collect_hris_descendants(document.root)
-        hris_tags = {node.tag for node in hris_nodes}
-        
         return {
             'original_node_count': original_count,
             'filtered_node_count': filtered_count,
             'nodes_removed': original_count - filtered_count,
-            'hris_nodes_found': len(hris_nodes),
+            'hris_nodes_found': hris_count,
             'unique_hris_tags': sorted(hris_tags)
         }
     
     def _count_nodes(self, node: Optional[XMLNode]) -> int:
-        """Cuenta nodos recursivamente."""
-        if node is None:
-            return 0
+        """Cuenta nodos del subárbol."""
+        if node is not None and node.subtree_size is not None:
+            return node.subtree_size
         
-        count = 1
-        for child in node.children:
-            count += self._count_nodes(child)
+        count = 0
+        stack = [node] if node is not None else []
+        
+        while stack:
+            current = stack.pop()
+            count += 1
+            stack.extend(current.children)
         
         return count
 
 
+@lru_cache(maxsize=None)
 def create_hris_filter(filter_csf: bool = False) -> XMLFilter:
     """
     Factory function para crear filtro HRIS.
     
+    La instancia se reutiliza entre llamadas con los mismos argumentos: el filtro
+    no guarda estado por documento.
+    
     Args:
         filter_csf: Si se debe aplicar filtro a documentos CSF
         
     Returns:
-        Instancia de XMLFilter configurada
+        Instancia de XMLFilter configurada (compartida)
     """
     return XMLFilter(filter_csf=filter_csf)
\ No newline at end of file
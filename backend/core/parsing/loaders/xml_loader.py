@@ -1,16 +1,52 @@
-import xml.etree.ElementTree as ET
+from lxml import etree as ET
 from pathlib import Path
-from typing import Dict, Union, Optional, Tuple
+from typing import Dict, Iterator, Union, Optional, Tuple
 import gzip
+import threading
 
 from ..exceptions.xml_exceptions import XMLValidationError, XMLParsingError
 
 
+_parser_local = threading.local()
+
+
+def _get_parser() -> ET.XMLParser:
+    """
+    Parser libxml2 reutilizable (uno por hilo, los parsers de lxml no se comparten).
+    """
+    parser = getattr(_parser_local, 'parser', None)
+    if parser is None:
+        parser = ET.XMLParser(
+            huge_tree=True,
+            remove_blank_text=True,
+            remove_comments=True,
+            remove_pis=True,
+            collect_ids=False,
+            resolve_entities='internal',
+            no_network=True
+        )
+        _parser_local.parser = parser
+    return parser
+
+
 class XMLLoader:
     """
     Cargador agnóstico de XML.
     """
 
+    # A partir de este tamaño en disco se parsea en streaming (iterparse)
+    STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+    @classmethod
+    def should_stream(cls, file_path: Union[str, Path]) -> bool:
+        """
+        Indica si el archivo es lo bastante grande para parsearse en streaming.
+        """
+        try:
+            return Path(file_path).stat().st_size >= cls.STREAMING_THRESHOLD_BYTES
+        except OSError:
+            return False
+
     @staticmethod
     def load_from_file(file_path: Union[str, Path],
                        xml_source: Optional[str] = None) -> ET.Element:
@@ -24,12 +60,11 @@ class XMLLoader:
 
         try:
             if file_path.suffix == '.gz':
-                with gzip.open(file_path, 'rt', encoding='utf-8') as f:
-                    content = f.read()
-                root = ET.fromstring(content)
+                with gzip.open(file_path, 'rb') as f:
+                    tree = ET.parse(f, parser=_get_parser())
             else:
-                tree = ET.parse(file_path)
-                root = tree.getroot()
+                tree = ET.parse(str(file_path), parser=_get_parser())
+            root = tree.getroot()
 
             if root is None:
                 raise XMLValidationError("Empty XML document", xml_source)
@@ -52,6 +87,50 @@ class XMLLoader:
                 xml_source
             )
 
+    @staticmethod
+    def iterparse_file(file_path: Union[str, Path],
+                       xml_source: Optional[str] = None) -> Iterator[Tuple[str, ET._Element]]:
+        """
+        Recorre el XML como eventos ('start', 'end') sin materializar el árbol completo.
+
+        El consumidor es responsable de liberar los elementos ya procesados.
+        """
+        file_path = Path(file_path)
+
+        if not file_path.exists():
+            raise FileNotFoundError(f"XML file not found: {file_path}")
+
+        if file_path.suffix == '.gz':
+            source = gzip.open(file_path, 'rb')
+        else:
+            source = open(file_path, 'rb')
+
+        try:
+            events = ET.iterparse(
+                source,
+                events=('start', 'end'),
+                huge_tree=True,
+                remove_blank_text=True,
+                remove_comments=True,
+                remove_pis=True,
+                resolve_entities='internal',
+                no_network=True
+            )
+            yield from events
+
+        except ET.ParseError as e:
+            raise XMLValidationError(
+                f"Invalid XML format: {str(e)}",
+                xml_source
+            )
+        except UnicodeDecodeError as e:
+            raise XMLValidationError(
+                f"Encoding error: {str(e)}",
+                xml_source
+            )
+        finally:
+            source.close()
+
     @staticmethod
     def load_from_string(xml_string: str,
                          xml_source: Optional[str] = None) -> ET.Element:
@@ -59,7 +138,10 @@ class XMLLoader:
         Carga XML desde string.
         """
         try:
-            root = ET.fromstring(xml_string)
+            # lxml no acepta str con declaración de encoding; se parsea en bytes
+            if isinstance(xml_string, str):
+                xml_string = xml_string.encode('utf-8')
+            root = ET.fromstring(xml_string, parser=_get_parser())
 
             if root is None:
                 raise XMLValidationError("Empty XML string", xml_source)
@@ -82,14 +164,11 @@ class XMLLoader:
         """
         Extrae namespaces del elemento raíz.
         """
-        namespaces = {}
-
-        for key, value in root.attrib.items():
-            if key.startswith('xmlns:'):
-                prefix = key.split(':', 1)[1]
-                namespaces[prefix] = value
-            elif key == 'xmlns':
-                namespaces['default'] = value
+        # Las declaraciones xmlns no llegan a attrib; libxml2 ya las expone en nsmap
+        namespaces = dict(root.nsmap)
+
+        if None in namespaces:
+            namespaces['default'] = namespaces.pop(None)
 
         return namespaces
 
@@ -3,14 +3,173 @@
 Gestor de metadata persistente para árboles XML parseados.
 Almacena el árbol exacto en formato serializable para acceso rápido.
 """
-import json
+import os
 import pickle
 import hashlib
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+import orjson
 from pathlib import Path
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, Optional, Union, List, Tuple
 from datetime import datetime
 
 from .models.xml_elements import XMLDocument, XMLNode
+from .utils.tree_stats import collect_tree_stats
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+
+# Raíz de almacenamiento: /metadata/[id]/[fecha]_[version]/
+_METADATA_BASE = Path("backend/storage/metadata")
+
+# Archivo por id con la siguiente versión a asignar: {"date": "YYYYMMDD", "next": N}
+_NEXT_VERSION_FILE = ".next_version"
+
+# Marca de reserva de una versión cuyo directorio aún no existe (se crea al
+# guardar); se crea con O_EXCL, así dos managers nunca reservan la misma
+_RESERVATION_FILE = ".{version_dir}.reserved"
+
+# Cabecera de cada versión con los campos que muestra list_versions
+_VERSION_HEADER_FILE = "header.json"
+
+# Vigencia (segundos) del listado de versiones cacheado por id
+_VERSION_LISTING_TTL = 1.0
+
+# Listado de directorios de versión por id: (instante, dirs por nombre descendente).
+# Compartido por todos los managers del proceso: cualquier save_document lo invalida
+_versions_cache: Dict[str, Tuple[float, List[Path]]] = {}
+
+# Hash de contenido (identificador, no uso criptográfico): BLAKE2b es más rápido que MD5
+_new_content_hash = partial(hashlib.blake2b, digest_size=16)
+
+# Opciones de escritura: mismo formato que json.dump(indent=2, ensure_ascii=False)
+_JSON_WRITE_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Documento serializado: pickle comprimido con zstd si está disponible, si no pickle plano
+_COMPRESSED_DOCUMENT_SUFFIX = ".pkl.zst"
+_DOCUMENT_SUFFIX = ".pkl"
+
+# Nivel bajo: el pickle del árbol comprime varias veces a cientos de MB/s
+_ZSTD_LEVEL = 3
+
+# Pool compartido para solapar las escrituras independientes de save_document
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="metadata-io")
+
+# Cola de guardados en segundo plano (save_document_async): un único hilo los
+# ejecuta en orden; sus escrituras van a _IO_POOL, nunca a esta misma cola
+_SAVE_QUEUE = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metadata-save")
+
+
+def _serialize_tree(obj: Any) -> Dict[str, Any]:
+    """
+    default= de orjson: entrega cada nodo con sus hijos sin convertir, de modo que
+    el árbol se recorre una sola vez durante la serialización (sin to_dict previo).
+    """
+    if isinstance(obj, XMLNode):
+        return {
+            'tag': obj.tag,
+            'technical_id': obj.technical_id,
+            'attributes': obj.attributes,
+            'labels': obj.labels,
+            'node_type': obj.node_type.value,
+            'namespace': obj.namespace,
+            'text_content': obj.text_content,
+            'depth': obj.depth,
+            'sibling_order': obj.sibling_order,
+            'children': obj.children
+        }
+    if isinstance(obj, XMLDocument):
+        return {
+            'source_name': obj.source_name,
+            'namespaces': obj.namespaces,
+            'version': obj.version,
+            'encoding': obj.encoding,
+            'root': obj.root
+        }
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _find_file(directory: Path,
+               prefix: str,
+               suffix: str,
+               exact_name: Optional[str] = None) -> Optional[Path]:
+    """
+    Busca en un único os.scandir el archivo exact_name o, si no existe, el primero
+    que empiece por prefix y termine en suffix (mismo criterio que glob, que
+    ignora los archivos ocultos).
+    """
+    fallback = None
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if name == exact_name:
+                    return Path(entry.path)
+                if (fallback is None and not name.startswith('.')
+                        and name.startswith(prefix) and name.endswith(suffix)):
+                    if exact_name is None:
+                        return Path(entry.path)
+                    fallback = Path(entry.path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    
+    return fallback
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _write_document_pickle(document: XMLDocument, document_file: Path) -> None:
+    if zstd is not None:
+        # Un compresor por escritura: ZstdCompressor no admite uso concurrente
+        # y los guardados pueden solaparse en _IO_POOL
+        compressor = zstd.ZstdCompressor(level=_ZSTD_LEVEL, threads=-1)
+        with open(document_file, 'wb') as raw, compressor.stream_writer(raw) as f:
+            pickle.dump(document, f, protocol=pickle.HIGHEST_PROTOCOL)
+    else:
+        with open(document_file, 'wb') as f:
+            pickle.dump(document, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_document_file(document_file: Union[str, Path]) -> XMLDocument:
+    """
+    Carga un documento serializado (document_*.pkl o document_*.pkl.zst).
+    
+    Args:
+        document_file: Ruta del archivo del documento
+        
+    Returns:
+        Documento XML cargado
+    """
+    document_file = Path(document_file)
+    compressed = document_file.name.endswith(_COMPRESSED_DOCUMENT_SUFFIX)
+    if compressed and zstd is None:
+        raise RuntimeError(
+            f"zstandard es necesario para leer {document_file.name}"
+        )
+    
+    # Lectura completa y pickle.loads sobre un único buffer: el unpickler no
+    # pide trozos pequeños al archivo (ni al lector de zstd) por cada opcode
+    data = document_file.read_bytes()
+    if compressed:
+        # decompressobj: los frames escritos con stream_writer no llevan el tamaño
+        data = zstd.ZstdDecompressor().decompressobj().decompress(data)
+    return pickle.loads(data)
+
+
+def _encode_hash_field(value: Optional[str]) -> bytes:
+    """Codifica un campo para el hash; None se distingue de la cadena vacía."""
+    if value is None:
+        return b'\x00'
+    return b'\x01' + str(value).encode('utf-8') + b'\x00'
 
 
 class MetadataManager:
@@ -21,7 +180,9 @@ class MetadataManager:
     def __init__(self, 
                  id: Optional[str] = None,
                  cliente: Optional[str] = None,
-                 consultor: Optional[str] = None):
+                 consultor: Optional[str] = None,
+                 emit_json_mirror: bool = False,
+                 read_only: bool = False):
         """
         Inicializa el gestor de metadata.
         
@@ -29,21 +190,34 @@ class MetadataManager:
             id: ID único para la instancia
             cliente: Nombre del cliente
             consultor: Nombre del consultor
+            emit_json_mirror: Si es True, guarda también el documento en JSON
+                para inspección (ver export_json para generarlo bajo demanda)
+            read_only: Si es True no se reserva versión (.next_version): el
+                manager solo carga y save_document no está disponible
         """
         # Usar valores por defecto si no se proporcionan
         self.id = id or "default_id"
         self.cliente = cliente or "default_cliente"
         self.consultor = consultor or "default_consultor"
+        self.emit_json_mirror = emit_json_mirror
         
         # Obtener fecha actual
         fecha_actual = datetime.now().strftime("%Y%m%d")
         
-        # Generar versión automáticamente según las existentes
-        version = self._get_next_version(self.id, fecha_actual)
-        
         # Estructura: /metadata/[id]/[fecha]_[version]/
-        self.base_dir = Path("backend/storage/metadata") / self.id / f"{fecha_actual}_{version}"
-        self.base_dir.mkdir(parents=True, exist_ok=True)
+        # El directorio se crea en el primer save_document: un manager que solo
+        # carga no deja una versión vacía que ocultaría la última guardada
+        self._base_dir_created = False
+        if read_only:
+            self.base_dir = None
+            self._base_dir_str = None
+            self._directory_structure = None
+        else:
+            # Generar versión automáticamente según las existentes
+            version = self._get_next_version(self.id, fecha_actual)
+            self.base_dir = self._id_dir(self.id) / f"{fecha_actual}_{version}"
+            self._base_dir_str = str(self.base_dir)
+            self._directory_structure = f"/metadata/{self.id}/{self.base_dir.name}/"
         
         # Parámetros del sistema para incluir en metadata
         self.metadata_params = {
@@ -51,13 +225,18 @@ class MetadataManager:
             'cliente': self.cliente,
             'consultor': self.consultor,
             'fecha_creacion': datetime.now().isoformat(),
-            'estructura_creacion': f"/metadata/{self.id}/{fecha_actual}_{version}/"
+            'estructura_creacion': self._directory_structure
         }
     
     def _get_next_version(self, id: str, fecha: str) -> str:
         """
         Calcula la siguiente versión disponible para la fecha actual.
         
+        Parte del archivo .next_version del id y solo recorre el directorio
+        cuando no existe, es de otra fecha o la versión que indica ya está
+        ocupada. La versión se reserva de forma atómica con su archivo de
+        reserva (O_EXCL): si otro manager se adelanta se prueba la siguiente.
+        
         Args:
             id: ID único
             fecha: Fecha en formato YYYYMMDD
@@ -65,18 +244,58 @@ class MetadataManager:
         Returns:
             String de versión (v1, v2, etc.)
         """
-        base_path = Path("backend/storage/metadata") / id
+        base_path = self._id_dir(id)
+        next_version_file = base_path / _NEXT_VERSION_FILE
+        
+        next_version = self._read_next_version(next_version_file, fecha)
+        if next_version is None:
+            next_version = self._scan_next_version(base_path, fecha)
         
+        while not self._reserve_version(base_path, f"{fecha}_v{next_version}"):
+            next_version = max(next_version + 1, self._scan_next_version(base_path, fecha))
+        
+        self._write_next_version(next_version_file, fecha, next_version + 1)
+        return f"v{next_version}"
+    
+    def _reserve_version(self, base_path: Path, version_dir: str) -> bool:
+        """Crea la reserva de version_dir; False si la versión ya está ocupada."""
+        reservation_file = base_path / _RESERVATION_FILE.format(version_dir=version_dir)
+        flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY
+        try:
+            try:
+                os.close(os.open(reservation_file, flags))
+            except FileNotFoundError:
+                # Primer manager del id
+                base_path.mkdir(parents=True, exist_ok=True)
+                os.close(os.open(reservation_file, flags))
+        except FileExistsError:
+            return False
+        
+        # save_document borra la reserva tras crear el directorio: si este ya
+        # existe, la versión es de otro manager
+        if (base_path / version_dir).exists():
+            reservation_file.unlink(missing_ok=True)
+            return False
+        return True
+    
+    def _scan_next_version(self, base_path: Path, fecha: str) -> int:
+        """Siguiente número de versión según los directorios y reservas existentes para la fecha."""
         if not base_path.exists():
-            return "v1"
+            return 1
         
-        # Buscar versiones existentes para esta fecha
+        # Buscar versiones existentes (o reservadas) para esta fecha
+        reserved_prefix = f".{fecha}"
         existing_versions = []
         for item in base_path.iterdir():
-            if item.is_dir() and item.name.startswith(fecha):
+            name = item.name
+            if name.startswith(reserved_prefix) and name.endswith(".reserved"):
+                name = name[1:-len(".reserved")]
+            elif not (item.is_dir() and name.startswith(fecha)):
+                continue
+            if name.startswith(fecha):
                 try:
                     # Extraer versión del nombre: fecha_version
-                    version_part = item.name.split('_')[1]
+                    version_part = name.split('_')[1]
                     if version_part.startswith('v'):
                         version_num = int(version_part[1:])
                         existing_versions.append(version_num)
@@ -84,10 +303,71 @@ class MetadataManager:
                     continue
         
         if not existing_versions:
-            return "v1"
+            return 1
         
-        next_version = max(existing_versions) + 1
-        return f"v{next_version}"
+        return max(existing_versions) + 1
+    
+    def _read_next_version(self, next_version_file: Path, fecha: str) -> Optional[int]:
+        try:
+            data = orjson.loads(next_version_file.read_bytes())
+            if data['date'] == fecha:
+                return int(data['next'])
+        except (OSError, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            pass
+        return None
+    
+    def _write_next_version(self, next_version_file: Path, fecha: str, next_version: int) -> None:
+        # Escritura atómica: archivo temporal propio del hilo + os.replace
+        temp_file = next_version_file.with_name(
+            f"{next_version_file.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            next_version_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file.write_bytes(orjson.dumps({'date': fecha, 'next': next_version}))
+            os.replace(temp_file, next_version_file)
+        except OSError:
+            # Es solo un atajo (la reserva la garantiza el archivo de reserva):
+            # sin él, la próxima vez se recorren los directorios
+            temp_file.unlink(missing_ok=True)
+    
+    def _id_dir(self, id: str) -> Path:
+        """Directorio de todas las versiones de un id."""
+        return _METADATA_BASE / id
+    
+    def _version_dirs(self, id: str) -> Optional[List[Path]]:
+        """
+        Directorios de versión de un id ordenados por nombre (más reciente primero).
+        
+        El listado se cachea (para todo el proceso) durante _VERSION_LISTING_TTL
+        segundos; save_document lo invalida. Retorna None si el id no tiene directorio.
+        """
+        cached = _versions_cache.get(id)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < _VERSION_LISTING_TTL:
+            return cached[1]
+        
+        base_path = self._id_dir(id)
+        if not base_path.exists():
+            _versions_cache.pop(id, None)
+            return None
+        
+        dirs = sorted([d for d in base_path.iterdir() if d.is_dir()],
+                      key=lambda x: x.name, reverse=True)
+        _versions_cache[id] = (now, dirs)
+        return dirs
+    
+    def _resolve_version_dir(self, id: str, version: Optional[str] = None) -> Path:
+        """Directorio de una versión concreta, o de la última si version es None."""
+        if version:
+            return self._id_dir(id) / version
+        
+        dirs = self._version_dirs(id)
+        if dirs is None:
+            raise FileNotFoundError(f"No metadata found for id: {id}")
+        if not dirs:
+            raise FileNotFoundError(f"No versions found for id: {id}")
+        
+        return dirs[0]
     
     def _calculate_content_hash(self, document: XMLDocument) -> str:
         """
@@ -97,42 +377,59 @@ class MetadataManager:
             document: Documento XML
             
         Returns:
-            Hash MD5 del contenido
+            Hash BLAKE2b del contenido
         """
-        content_data = {
-            'source_name': document.source_name,
-            'namespaces': document.namespaces,
-            'root_hash': self._hash_node(document.root)
-        }
-        
-        content_str = json.dumps(content_data, sort_keys=True)
-        return hashlib.md5(content_str.encode()).hexdigest()[:12]
+        content_hash = _new_content_hash()
+        content_hash.update(_encode_hash_field(document.source_name))
+        for prefix, uri in sorted(document.namespaces.items()):
+            content_hash.update(_encode_hash_field(prefix))
+            content_hash.update(_encode_hash_field(uri))
+        content_hash.update(self._node_digest(document.root))
+        return content_hash.hexdigest()[:12]
     
-    def _hash_node(self, node: XMLNode) -> str:
+    def _node_digest(self, node: Optional[XMLNode]) -> bytes:
         """
-        Calcula hash recursivo de un nodo.
+        Digest BLAKE2b (16 bytes) del subárbol, en un recorrido post-order iterativo.
         
-        Args:
-            node: Nodo XML
-            
-        Returns:
-            Hash del nodo y sus hijos
+        Cada nodo alimenta el hash con sus campos codificados y los digests de sus
+        hijos, sin construir diccionarios ni serializar a JSON.
         """
-        node_data = {
-            'tag': node.tag,
-            'technical_id': node.technical_id,
-            'attributes': node.attributes,
-            'labels': node.labels,
-            'node_type': node.node_type.value,
-            'text_content': node.text_content,
-            'children_count': len(node.children)
-        }
+        if node is None:
+            return _new_content_hash(_encode_hash_field(None)).digest()
         
-        children_hashes = [self._hash_node(child) for child in node.children]
-        node_data['children_hashes'] = children_hashes
+        digests: Dict[int, bytes] = {}
+        stack = [(node, False)]
         
-        node_str = json.dumps(node_data, sort_keys=True)
-        return hashlib.md5(node_str.encode()).hexdigest()[:8]
+        while stack:
+            current, visited = stack.pop()
+            children = current.children
+            
+            if children and not visited:
+                stack.append((current, True))
+                stack.extend((child, False) for child in children)
+                continue
+            
+            node_hash = _new_content_hash()
+            update = node_hash.update
+            update(_encode_hash_field(current.tag))
+            update(_encode_hash_field(current.technical_id))
+            for key, value in sorted(current.attributes.items()):
+                update(_encode_hash_field(key))
+                update(_encode_hash_field(value))
+            update(b'\x02')
+            for lang, label in sorted(current.labels.items()):
+                update(_encode_hash_field(lang))
+                update(_encode_hash_field(label))
+            update(b'\x02')
+            update(_encode_hash_field(current.node_type.value))
+            update(_encode_hash_field(current.text_content))
+            update(len(children).to_bytes(4, 'little'))
+            for child in children:
+                update(digests.pop(id(child)))
+            
+            digests[id(current)] = node_hash.digest()
+        
+        return digests[id(node)]
     
     def save_document(self,
                      document: XMLDocument,
@@ -149,40 +446,45 @@ class MetadataManager:
         Returns:
             Información de la versión guardada
         """
+        if self.base_dir is None:
+            raise RuntimeError("MetadataManager de solo lectura: no tiene versión para guardar")
+        
         # Usar ID proporcionado o el del manager
         document_id = id or self.id
         
-        timestamp = datetime.now()
+        # Un único instante por guardado, reutilizado en metadata, cabecera y retorno
+        timestamp = datetime.now().isoformat()
         
         # Calcular hash del contenido
         content_hash = self._calculate_content_hash(document)
+        tree_stats = collect_tree_stats(document.root)
         
         # Preparar metadata completa con información de creación
         full_metadata = {
             # Información de creación del sistema (como comentarios en la estructura)
             'system_info': {
                 'created_by': 'MetadataManager',
-                'creation_timestamp': datetime.now().isoformat(),
+                'creation_timestamp': timestamp,
                 'parameters': {
                     'id': self.id,
                     'cliente': self.cliente,
                     'consultor': self.consultor
                 },
-                'directory_structure': f"/metadata/{self.id}/{self.base_dir.name}/"
+                'directory_structure': self._directory_structure
             },
             
             # Metadata del documento
             'document_info': {
                 'id': document_id,
-                'timestamp': timestamp.isoformat(),
+                'timestamp': timestamp,
                 'content_hash': content_hash,
                 'source_name': document.source_name,
                 'namespaces': document.namespaces,
                 'version_xml': document.version,
                 'encoding': document.encoding,
                 'stats': {
-                    'node_count': self._count_nodes(document.root),
-                    'unique_tags': self._collect_unique_tags(document.root)
+                    'node_count': tree_stats.node_count,
+                    'unique_tags': sorted(tree_stats.tags)
                 }
             },
             
@@ -190,31 +492,119 @@ class MetadataManager:
             'custom_metadata': metadata or {}
         }
         
-        # Guardar metadata
+        if not self._base_dir_created:
+            self.base_dir.mkdir(parents=True, exist_ok=True)
+            self._base_dir_created = True
+            # El directorio ya ocupa la versión: la reserva sobra
+            reservation_file = self.base_dir.with_name(
+                _RESERVATION_FILE.format(version_dir=self.base_dir.name)
+            )
+            reservation_file.unlink(missing_ok=True)
+        
         metadata_file = self.base_dir / f"metadata_{document_id}.json"
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(full_metadata, f, indent=2, ensure_ascii=False)
+        header_file = self.base_dir / _VERSION_HEADER_FILE
         
-        # Guardar documento serializado
-        document_file = self.base_dir / f"document_{document_id}.pkl"
-        with open(document_file, 'wb') as f:
-            pickle.dump(document, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Metadata y cabecera mínima de la versión (list_versions solo necesita estos campos)
+        metadata_bytes = orjson.dumps(full_metadata, option=_JSON_WRITE_OPTIONS)
+        header_bytes = orjson.dumps({
+            'version': self.base_dir.name,
+            'timestamp': timestamp,
+            'content_hash': content_hash,
+            'source_name': document.source_name
+        })
+        
+        # Documento serializado (comprimido en streaming si hay zstd)
+        suffix = _COMPRESSED_DOCUMENT_SUFFIX if zstd is not None else _DOCUMENT_SUFFIX
+        document_file = self.base_dir / f"document_{document_id}{suffix}"
         
-        # Guardar en formato JSON para inspección
-        json_file = self.base_dir / f"document_{document_id}.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(document.to_dict(), f, indent=2, ensure_ascii=False)
+        # Las escrituras son independientes: se solapan en el pool de E/S
+        futures = [
+            _IO_POOL.submit(_write_document_pickle, document, document_file),
+            _IO_POOL.submit(_write_bytes, metadata_file, metadata_bytes),
+            _IO_POOL.submit(_write_bytes, header_file, header_bytes)
+        ]
+        
+        # Guardar en formato JSON para inspección (opcional)
+        json_file = None
+        if self.emit_json_mirror:
+            json_file = self.base_dir / f"document_{document_id}.json"
+            futures.append(_IO_POOL.submit(self._write_document_json, document, json_file))
+        
+        # result() propaga la primera excepción de cualquier escritura
+        for future in futures:
+            future.result()
+        
+        _versions_cache.pop(self.id, None)
+        _versions_cache.pop(document_id, None)
         
         return {
             'id': document_id,
-            'path': str(self.base_dir),
+            'path': self._base_dir_str,
             'metadata_file': str(metadata_file),
             'document_file': str(document_file),
-            'json_file': str(json_file),
+            'json_file': str(json_file) if json_file else None,
             'content_hash': content_hash,
-            'timestamp': timestamp.isoformat()
+            'timestamp': timestamp
         }
     
+    def save_document_async(self,
+                            document: XMLDocument,
+                            id: Optional[str] = None,
+                            metadata: Optional[Dict[str, Any]] = None) -> "Future[Dict[str, Any]]":
+        """
+        Encola save_document y retorna de inmediato.
+        
+        El documento no debe modificarse hasta que el guardado termine.
+        
+        Returns:
+            Future con la información de la versión guardada (result() propaga
+            cualquier error de escritura)
+        """
+        return _SAVE_QUEUE.submit(self.save_document, document, id, metadata)
+    
+    def discard_version(self, id: Optional[str] = None) -> None:
+        """
+        Elimina el directorio de versión de este manager y lo que se haya guardado en él.
+        
+        Para deshacer un guardado que no debe quedar (p. ej. la operación que lo
+        acompañaba falló). El número de versión no se reutiliza.
+        """
+        if self._base_dir_created:
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+            self._base_dir_created = False
+        
+        _versions_cache.pop(self.id, None)
+        if id is not None:
+            _versions_cache.pop(id, None)
+    
+    def export_json(self,
+                    id: str,
+                    version: Optional[str] = None) -> Path:
+        """
+        Genera bajo demanda el JSON de inspección de un documento guardado.
+        
+        Args:
+            id: ID de la instancia
+            version: Versión específica (última si None)
+            
+        Returns:
+            Ruta del archivo JSON generado junto al documento
+        """
+        document_file = self._find_document_file(id, version)
+        document = load_document_file(document_file)
+        
+        json_file = document_file.parent / f"document_{id}.json"
+        self._write_document_json(document, json_file)
+        return json_file
+    
+    def _write_document_json(self, document: XMLDocument, json_file: Path) -> None:
+        with open(json_file, 'wb') as f:
+            f.write(orjson.dumps(
+                document,
+                default=_serialize_tree,
+                option=_JSON_WRITE_OPTIONS | orjson.OPT_PASSTHROUGH_DATACLASS
+            ))
+    
     def load_document(self,
                      id: str,
                      version: Optional[str] = None) -> XMLDocument:
@@ -231,40 +621,25 @@ class MetadataManager:
         Raises:
             FileNotFoundError: Si no se encuentra la metadata
         """
-        # Determinar directorio de búsqueda
-        if version:
-            # Buscar versión específica
-            version_dir = Path("backend/storage/metadata") / id / version
-        else:
-            # Buscar última versión
-            base_path = Path("backend/storage/metadata") / id
-            if not base_path.exists():
-                raise FileNotFoundError(f"No metadata found for id: {id}")
-            
-            # Obtener directorios ordenados por nombre (fecha descendente)
-            dirs = sorted([d for d in base_path.iterdir() if d.is_dir()], 
-                         key=lambda x: x.name, reverse=True)
-            
-            if not dirs:
-                raise FileNotFoundError(f"No versions found for id: {id}")
-            
-            version_dir = dirs[0]
-        
-        # Buscar documento
-        document_file = version_dir / f"document_{id}.pkl"
-        
-        if not document_file.exists():
-            # Intentar con patrón alternativo
-            document_files = list(version_dir.glob("*.pkl"))
-            if not document_files:
-                raise FileNotFoundError(f"No document file found in: {version_dir}")
-            document_file = document_files[0]
+        document_file = self._find_document_file(id, version)
         
         # Cargar documento
-        with open(document_file, 'rb') as f:
-            document = pickle.load(f)
-        
-        return document
+        return load_document_file(document_file)
+    
+    def _find_document_file(self, id: str, version: Optional[str] = None) -> Path:
+        """Localiza el pickle del documento (última versión si version es None)."""
+        version_dir = self._resolve_version_dir(id, version)
+        
+        # Buscar documento (o cualquier .pkl / .pkl.zst como patrón alternativo)
+        document_file = (
+            _find_file(version_dir, "", _COMPRESSED_DOCUMENT_SUFFIX,
+                       f"document_{id}{_COMPRESSED_DOCUMENT_SUFFIX}")
+            or _find_file(version_dir, "", _DOCUMENT_SUFFIX, f"document_{id}{_DOCUMENT_SUFFIX}")
+        )
+        if document_file is None:
+            raise FileNotFoundError(f"No document file found in: {version_dir}")
+        
+        return document_file
     
     def load_metadata(self,
                      id: str,
@@ -279,37 +654,15 @@ class MetadataManager:
         Returns:
             Metadata cargada
         """
-        # Determinar directorio
-        if version:
-            version_dir = Path("backend/storage/metadata") / id / version
-        else:
-            base_path = Path("backend/storage/metadata") / id
-            if not base_path.exists():
-                raise FileNotFoundError(f"No metadata found for id: {id}")
-            
-            dirs = sorted([d for d in base_path.iterdir() if d.is_dir()], 
-                         key=lambda x: x.name, reverse=True)
-            
-            if not dirs:
-                raise FileNotFoundError(f"No versions found for id: {id}")
-            
-            version_dir = dirs[0]
-        
-        # Buscar archivo de metadata
-        metadata_file = version_dir / f"metadata_{id}.json"
+        version_dir = self._resolve_version_dir(id, version)
         
-        if not metadata_file.exists():
-            # Intentar con patrón alternativo
-            metadata_files = list(version_dir.glob("metadata*.json"))
-            if not metadata_files:
-                raise FileNotFoundError(f"No metadata file found in: {version_dir}")
-            metadata_file = metadata_files[0]
+        # Buscar archivo de metadata (o metadata*.json como patrón alternativo)
+        metadata_file = _find_file(version_dir, "metadata", ".json", f"metadata_{id}.json")
+        if metadata_file is None:
+            raise FileNotFoundError(f"No metadata file found in: {version_dir}")
         
         # Cargar metadata
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
-        
-        return metadata
+        return orjson.loads(metadata_file.read_bytes())
     
     def list_versions(self, id: str) -> List[Dict[str, Any]]:
         """
@@ -321,55 +674,49 @@ class MetadataManager:
         Returns:
             Lista de información de versiones
         """
-        base_path = Path("backend/storage/metadata") / id
-        
-        if not base_path.exists():
-            return []
-        
         versions = []
         
-        for item in base_path.iterdir():
-            if item.is_dir():
-                # Buscar archivos de metadata
-                metadata_files = list(item.glob("metadata*.json"))
-                if metadata_files:
-                    try:
-                        metadata_file = metadata_files[0]
-                        with open(metadata_file, 'r', encoding='utf-8') as f:
-                            metadata = json.load(f)
-                        
-                        versions.append({
-                            'version': item.name,
-                            'timestamp': metadata.get('document_info', {}).get('timestamp', ''),
-                            'content_hash': metadata.get('document_info', {}).get('content_hash', ''),
-                            'source_name': metadata.get('document_info', {}).get('source_name', ''),
-                            'path': str(item)
-                        })
-                    except:
-                        continue
+        for item in self._version_dirs(id) or []:
+            # Leer solo la cabecera de la versión
+            try:
+                header = orjson.loads((item / _VERSION_HEADER_FILE).read_bytes())
+                versions.append({
+                    'version': item.name,
+                    'timestamp': header.get('timestamp', ''),
+                    'content_hash': header.get('content_hash', ''),
+                    'source_name': header.get('source_name', ''),
+                    'path': str(item)
+                })
+                continue
+            except (OSError, orjson.JSONDecodeError, AttributeError):
+                pass
+            
+            # Versiones anteriores a la cabecera: leer el archivo de metadata completo
+            metadata_file = _find_file(item, "metadata", ".json")
+            if metadata_file:
+                try:
+                    metadata = orjson.loads(metadata_file.read_bytes())
+                    
+                    versions.append({
+                        'version': item.name,
+                        'timestamp': metadata.get('document_info', {}).get('timestamp', ''),
+                        'content_hash': metadata.get('document_info', {}).get('content_hash', ''),
+                        'source_name': metadata.get('document_info', {}).get('source_name', ''),
+                        'path': str(item)
+                    })
+                except:
+                    continue
         
         # Ordenar por versión (nombre de directorio) descendente
         versions.sort(key=lambda x: x['version'], reverse=True)
         return versions
-    
-    def _count_nodes(self, node: XMLNode) -> int:
-        """Cuenta nodos recursivamente."""
-        count = 1
-        for child in node.children:
-            count += self._count_nodes(child)
-        return count
-    
-    def _collect_unique_tags(self, node: XMLNode) -> List[str]:
-        """Recolecta tags únicos."""
-        tags = {node.tag}
-        for child in node.children:
-            tags.update(self._collect_unique_tags(child))
-        return sorted(tags)
 
 
 def get_metadata_manager(id: Optional[str] = None,
                         cliente: Optional[str] = None,
-                        consultor: Optional[str] = None) -> MetadataManager:
+                        consultor: Optional[str] = None,
+                        emit_json_mirror: bool = False,
+                        read_only: bool = False) -> MetadataManager:
     """
     Crea y retorna una instancia de MetadataManager.
     
@@ -377,6 +724,8 @@ def get_metadata_manager(id: Optional[str] = None,
         id: ID único para la instancia
         cliente: Nombre del cliente
         consultor: Nombre del consultor
+        emit_json_mirror: Si es True, guarda también el documento en JSON
+        read_only: Si es True no se reserva versión (solo carga)
         
     Returns:
         Instancia de MetadataManager
@@ -384,5 +733,7 @@ def get_metadata_manager(id: Optional[str] = None,
     return MetadataManager(
         id=id,
         cliente=cliente,
-        consultor=consultor
+        consultor=consultor,
+        emit_json_mirror=emit_json_mirror,
+        read_only=read_only
     )
\ No newline at end of file
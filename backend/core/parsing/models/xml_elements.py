@@ -1,5 +1,6 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
+import sys
+from dataclasses import dataclass, field, fields
 from typing import Dict, List, Optional, Any, Union
 from enum import Enum
 
@@ -23,20 +24,68 @@ class NodeType(str, Enum):
         if "isComposite" in attributes and attributes["isComposite"].lower() == "true":
             return cls.COMPOSITE
 
-        if "association" in tag.lower() or "isAssociation" in attributes:
+        if "isAssociation" in attributes or (len(tag) >= 11 and "association" in tag.lower()):
             return cls.ASSOCIATION
 
-        field_indicators = {"type", "label", "name", "id"}
-        if any(indicator in str(attributes).lower() for indicator in field_indicators):
+        if _has_field_indicator(attributes):
             return cls.FIELD
 
         return cls.ELEMENT
 
 
-@dataclass
+_FIELD_INDICATORS = ("type", "label", "name", "id")
+
+_TECHNICAL_ID_KEYS = {'id', 'technicalId', 'name', 'code'}
+
+
+def default_technical_id(attributes: Dict[str, str]) -> Optional[str]:
+    """
+    Id técnico que toma un nodo construido sin technical_id.
+
+    Se expone para resolver el id antes de construir el nodo (parseo en
+    streaming) con exactamente la misma precedencia.
+    """
+    for possible_id in _TECHNICAL_ID_KEYS:
+        if possible_id in attributes:
+            return attributes[possible_id]
+    return None
+
+
+def _has_field_indicator(attributes: Dict[str, str]) -> bool:
+    """
+    Equivale a buscar los indicadores en str(attributes).lower() sin construir el
+    repr del dict: se buscan en claves y valores unidos por espacios.
+
+    El repr solo difiere para textos no imprimibles (sus escapes, p. ej. "\\n",
+    pueden formar un indicador); en ese caso se usa la comparación original.
+    """
+    if not attributes:
+        return False
+
+    try:
+        text = " ".join(attributes) + " " + " ".join(attributes.values())
+    except TypeError:
+        text = None
+
+    if text is not None:
+        lowered = text.lower()
+        if any(indicator in lowered for indicator in _FIELD_INDICATORS):
+            return True
+        if text.isprintable():
+            return False
+
+    lowered = str(attributes).lower()
+    return any(indicator in lowered for indicator in _FIELD_INDICATORS)
+
+
+@dataclass(slots=True)
 class XMLNode:
     """
     Representación completa y neutra de un nodo XML.
+
+    Las copias creadas por XMLFilter comparten los dicts attributes y labels
+    con el nodo de origen: el árbol original no debe seguir usándose (ni
+    modificándose) una vez filtrado.
     """
     tag: str
     technical_id: Optional[str] = None
@@ -49,31 +98,118 @@ class XMLNode:
     namespace: Optional[str] = None
     text_content: Optional[str] = None
     node_type: NodeType = NodeType.UNKNOWN
+    # Tamaño del subárbol (nodo incluido) cuando quien lo construye lo conoce;
+    # None si no se ha calculado. No se actualiza si el árbol se modifica después.
+    subtree_size: Optional[int] = field(default=None, compare=False, repr=False)
+    # tag en minúsculas, calculado una vez al construir el nodo
+    tag_lower: str = field(init=False, compare=False, repr=False)
 
     def __post_init__(self):
+        # tag y tag_lower se repiten en miles de nodos: una sola copia de cada uno
+        self.tag = sys.intern(self.tag)
+        self.tag_lower = sys.intern(self.tag.lower())
         self.node_type = NodeType.from_structure(self.tag, self.attributes, self.children)
 
         if not self.technical_id:
-            possible_ids = {'id', 'technicalId', 'name', 'code'}
-            for possible_id in possible_ids:
-                if possible_id in self.attributes:
-                    self.technical_id = self.attributes[possible_id]
-                    break
+            self._set_default_technical_id()
+
+    def _set_default_technical_id(self):
+        technical_id = default_technical_id(self.attributes)
+        if technical_id is not None:
+            self.technical_id = technical_id
+
+    def copy_without_children(self,
+                              parent: Optional[XMLNode] = None,
+                              sibling_order: Optional[int] = None) -> XMLNode:
+        """
+        Copia el nodo sin sus hijos, con dicts attributes y labels propios.
+
+        Equivale a construir XMLNode con los mismos campos y children=[], pero
+        reutiliza tag y tag_lower ya internados en lugar de pasar por
+        __init__/__post_init__; node_type se vuelve a calcular igual que allí.
+        """
+        attributes = self.attributes.copy()
+        node = object.__new__(XMLNode)
+        node.tag = self.tag
+        node.tag_lower = self.tag_lower
+        node.technical_id = self.technical_id
+        node.attributes = attributes
+        node.labels = self.labels.copy()
+        node.children = []
+        node.parent = parent
+        node.depth = self.depth
+        node.sibling_order = self.sibling_order if sibling_order is None else sibling_order
+        node.namespace = self.namespace
+        node.text_content = self.text_content
+        node.node_type = NodeType.from_structure(self.tag, attributes, node.children)
+        node.subtree_size = None
+
+        if not node.technical_id:
+            node._set_default_technical_id()
+
+        return node
+
+    def __reduce__(self):
+        """
+        Serializa el subárbol como una lista plana de tuplas en pre-order, sin la
+        referencia al padre: un subárbol se puede enviar a otro proceso sin
+        arrastrar el árbol completo, y pickle procesa tuplas y dicts en C en
+        lugar de un estado por nodo. _rebuild_tree reconstruye los enlaces.
+
+        Los nodos internos no conservan su identidad frente a otras referencias
+        externas al mismo pickle: se serializa el árbol, no el grafo de objetos.
+        """
+        return _rebuild_tree, (_flatten_tree(self),)
+
+    def __setstate__(self, state: Dict[str, Any]):
+        # Pickles anteriores a __reduce__: estado por nodo, quizá sin todos los campos
+        for name, default in _XMLNODE_STATE_DEFAULTS.items():
+            object.__setattr__(self, name, state.get(name, default))
+        for name in _XMLNODE_FIELDS:
+            if name not in _XMLNODE_STATE_DEFAULTS:
+                object.__setattr__(self, name, state[name])
+        self.tag = sys.intern(self.tag)
+        if self.tag_lower is None:
+            self.tag_lower = self.tag.lower()
+        self.tag_lower = sys.intern(self.tag_lower)
+        for child in self.children:
+            child.parent = self
 
     def to_dict(self) -> Dict[str, Any]:
-        """Convierte el nodo a un dict para serialización."""
-        return {
-            'tag': self.tag,
-            'technical_id': self.technical_id,
-            'attributes': self.attributes,
-            'labels': self.labels,
-            'node_type': self.node_type.value,
-            'namespace': self.namespace,
-            'text_content': self.text_content,
-            'depth': self.depth,
-            'sibling_order': self.sibling_order,
-            'children': [child.to_dict() for child in self.children]
-        }
+        """
+        Convierte el nodo a un dict para serialización.
+
+        Recorrido iterativo: cada dict se añade a la lista 'children' de su padre
+        al visitarlo. No se cachea el resultado porque el árbol se modifica en
+        sitio (marcado de origen, duplicación, fusión) sin notificar al nodo.
+        """
+        result = None
+        stack = [(self, None)]
+
+        while stack:
+            node, parent_children = stack.pop()
+            node_dict = {
+                'tag': node.tag,
+                'technical_id': node.technical_id,
+                'attributes': node.attributes,
+                'labels': node.labels,
+                'node_type': node.node_type.value,
+                'namespace': node.namespace,
+                'text_content': node.text_content,
+                'depth': node.depth,
+                'sibling_order': node.sibling_order,
+                'children': []
+            }
+
+            if parent_children is None:
+                result = node_dict
+            else:
+                parent_children.append(node_dict)
+
+            child_list = node_dict['children']
+            stack.extend((child, child_list) for child in reversed(node.children))
+
+        return result
 
     def find_nodes_by_tag(self, tag_pattern: str) -> List[XMLNode]:
         """Encuentra nodos por patrón de tag."""
@@ -92,7 +228,75 @@ class XMLNode:
         return self.attributes.get(attr_name, default)
 
 
-@dataclass
+_XMLNODE_FIELDS = tuple(f.name for f in fields(XMLNode))
+
+
+def _flatten_tree(root: XMLNode) -> List[tuple]:
+    """Filas (campos..., número de hijos) del subárbol en pre-order."""
+    rows = []
+    append = rows.append
+    stack = [root]
+    pop = stack.pop
+    extend = stack.extend
+
+    while stack:
+        node = pop()
+        children = node.children
+        append((node.tag, node.technical_id, node.attributes, node.labels,
+                node.depth, node.sibling_order, node.namespace, node.text_content,
+                node.node_type, node.subtree_size, node.tag_lower, len(children)))
+        extend(reversed(children))
+
+    return rows
+
+
+def _rebuild_tree(rows: List[tuple]) -> XMLNode:
+    """Inversa de _flatten_tree; no ejecuta __post_init__ (los valores ya están resueltos)."""
+    new_node = object.__new__
+    intern = sys.intern
+    root = None
+    # Padres con hijos pendientes: [nodo, hijos que faltan]
+    pending = []
+
+    for (tag, technical_id, attributes, labels, depth, sibling_order, namespace,
+         text_content, node_type, subtree_size, tag_lower, child_count) in rows:
+        node = new_node(XMLNode)
+        node.tag = intern(tag)
+        node.technical_id = technical_id
+        node.attributes = attributes
+        node.labels = labels
+        node.children = []
+        node.depth = depth
+        node.sibling_order = sibling_order
+        node.namespace = namespace
+        node.text_content = text_content
+        node.node_type = node_type
+        node.subtree_size = subtree_size
+        node.tag_lower = intern(tag_lower)
+
+        if pending:
+            top = pending[-1]
+            parent = top[0]
+            node.parent = parent
+            parent.children.append(node)
+            top[1] -= 1
+            if not top[1]:
+                pending.pop()
+        else:
+            node.parent = None
+            root = node
+
+        if child_count:
+            pending.append([node, child_count])
+
+    return root
+
+
+# Campos añadidos después de que existieran documentos serializados
+_XMLNODE_STATE_DEFAULTS = {'parent': None, 'subtree_size': None, 'tag_lower': None}
+
+
+@dataclass(slots=True)
 class XMLDocument:
     """
     Documento XML completo con metadata.
@@ -102,6 +306,16 @@ class XMLDocument:
     namespaces: Dict[str, str] = field(default_factory=dict)
     version: Optional[str] = None
     encoding: Optional[str] = None
+    # Tipo de archivo de origen ('main' o 'csf'), usado al fusionar documentos
+    file_type: str = 'main'
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in _XMLDOCUMENT_FIELDS}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        # Documentos guardados antes de usar slots: estado en __dict__, quizá sin file_type
+        for name in _XMLDOCUMENT_FIELDS:
+            object.__setattr__(self, name, state.get(name, _XMLDOCUMENT_STATE_DEFAULTS.get(name)))
 
     def to_dict(self) -> Dict[str, Any]:
         """Convierte el documento a un dict para serialización."""
@@ -111,4 +325,8 @@ class XMLDocument:
             'version': self.version,
             'encoding': self.encoding,
             'root': self.root.to_dict()
-        }
\ No newline at end of file
+        }
+
+
+_XMLDOCUMENT_FIELDS = tuple(f.name for f in fields(XMLDocument))
+_XMLDOCUMENT_STATE_DEFAULTS = {'file_type': 'main'}
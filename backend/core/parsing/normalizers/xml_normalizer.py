@@ -1,8 +1,10 @@
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime
+from functools import lru_cache
 import re
 
 from ..models.xml_elements import XMLNode, XMLDocument
+from ..utils.tree_stats import TreeStats, collect_tree_stats
 
 
 class XMLNormalizer:
@@ -49,28 +51,45 @@ class XMLNormalizer:
 
     def _normalize_node(self, node: XMLNode) -> Dict[str, Any]:
         """
-        Normaliza un nodo recursivamente.
+        Normaliza un nodo y su subárbol (recorrido pre-order iterativo).
         """
-        normalized = {
-            'tag': node.tag,
-            'node_type': node.node_type.value,
-            'technical_id': node.technical_id,
-            'depth': node.depth,
-            'sibling_order': node.sibling_order,
-            'namespace': node.namespace,
-            'text_content': node.text_content,
-            'attributes': {
-                'raw': node.attributes,
-                'normalized': self._normalize_attributes(node.attributes)
-            },
-            'labels': node.labels,
-            'children': [self._normalize_node(child) for child in node.children],
-            'has_children': len(node.children) > 0,
-            'has_labels': len(node.labels) > 0,
-            'has_attributes': len(node.attributes) > 0
-        }
+        normalized_root = None
+        # Cada entrada: (nodo, lista 'children' del padre ya normalizado)
+        stack = [(node, None)]
 
-        return normalized
+        while stack:
+            current, parent_children = stack.pop()
+            children = current.children
+
+            normalized = {
+                'tag': current.tag,
+                'node_type': current.node_type.value,
+                'technical_id': current.technical_id,
+                'depth': current.depth,
+                'sibling_order': current.sibling_order,
+                'namespace': current.namespace,
+                'text_content': current.text_content,
+                'attributes': {
+                    'raw': current.attributes,
+                    'normalized': self._normalize_attributes(current.attributes)
+                },
+                'labels': current.labels,
+                'children': [],
+                'has_children': len(children) > 0,
+                'has_labels': len(current.labels) > 0,
+                'has_attributes': len(current.attributes) > 0
+            }
+
+            if parent_children is None:
+                normalized_root = normalized
+            else:
+                parent_children.append(normalized)
+
+            # Los hermanos salen de la pila en orden, así 'children' conserva el orden original
+            child_list = normalized['children']
+            stack.extend((child, child_list) for child in reversed(children))
+
+        return normalized_root
 
     def _normalize_attributes(self, attributes: Dict[str, str]) -> Dict[str, Any]:
         """
@@ -83,9 +102,13 @@ class XMLNormalizer:
                 normalized[key] = None
                 continue
 
-            normalized_value = self._normalize_value(value)
+            if isinstance(value, str):
+                normalized_value, reliable = _classify_value(value)
+            else:
+                normalized_value = self._normalize_value(value)
+                reliable = self._is_normalization_reliable(value)
 
-            if normalized_value != value and self._is_normalization_reliable(value):
+            if normalized_value != value and reliable:
                 normalized[key] = {
                     'raw': value,
                     'normalized': normalized_value,
@@ -96,15 +119,16 @@ class XMLNormalizer:
 
         return normalized
 
-    def _normalize_value(self, value: str) -> Any:
+    @classmethod
+    def _normalize_value(cls, value: str) -> Any:
         """
         Normaliza un valor string a tipo más específico cuando es inequívoco.
         """
         value_str = str(value).strip()
         lower_val = value_str.lower()
 
-        if lower_val in self.BOOLEAN_PATTERNS:
-            return self.BOOLEAN_PATTERNS[lower_val]
+        if lower_val in cls.BOOLEAN_PATTERNS:
+            return cls.BOOLEAN_PATTERNS[lower_val]
 
         if value_str.isdigit() or (value_str.startswith('-') and value_str[1:].isdigit()):
             try:
@@ -114,7 +138,7 @@ class XMLNormalizer:
             except (ValueError, OverflowError):
                 pass
 
-        if self.NUMBER_PATTERN.match(value_str):
+        if _may_be_number(value_str) and cls.NUMBER_PATTERN.match(value_str):
             try:
                 float_val = float(value_str)
                 if '.' in value_str:
@@ -124,7 +148,7 @@ class XMLNormalizer:
             except (ValueError, OverflowError):
                 pass
 
-        if self.ISO_DATE_PATTERN.match(value_str):
+        if _may_be_iso_date(value_str) and cls.ISO_DATE_PATTERN.match(value_str):
             try:
                 from datetime import datetime
                 if 'T' in value_str:
@@ -137,13 +161,14 @@ class XMLNormalizer:
 
         return value
 
-    def _is_normalization_reliable(self, value: str) -> bool:
+    @classmethod
+    def _is_normalization_reliable(cls, value: str) -> bool:
         """
         Determina si la normalización de tipo es confiable.
         """
         value_str = str(value).strip()
 
-        if value_str.lower() in self.BOOLEAN_PATTERNS:
+        if value_str.lower() in cls.BOOLEAN_PATTERNS:
             return True
 
         if value_str.isdigit():
@@ -152,119 +177,115 @@ class XMLNormalizer:
             except (ValueError, OverflowError):
                 return False
 
-        if self.NUMBER_PATTERN.match(value_str):
+        if _may_be_number(value_str) and cls.NUMBER_PATTERN.match(value_str):
             try:
                 float_val = float(value_str)
                 return str(float_val) == value_str or f"{float_val:.{len(value_str.split('.')[1])}f}" == value_str
             except (ValueError, OverflowError, IndexError):
                 return False
 
-        if self.ISO_DATE_PATTERN.match(value_str):
+        if _may_be_iso_date(value_str) and cls.ISO_DATE_PATTERN.match(value_str):
             return True
 
         return False
 
     def _calculate_statistics(self, document: XMLDocument) -> Dict[str, Any]:
-        """Calcula estadísticas del documento normalizado."""
+        """Calcula estadísticas del documento normalizado (un solo recorrido)."""
+        tree_stats = collect_tree_stats(document.root)
+
         stats = {
-            'total_nodes': self._count_nodes(document.root),
-            'unique_tags': self._collect_unique_tags(document.root),
-            'attribute_summary': self._summarize_attributes(document.root),
-            'label_summary': self._summarize_labels(document.root)
+            'total_nodes': tree_stats.node_count,
+            'unique_tags': sorted(tree_stats.tags),
+            'attribute_summary': self._summarize_attributes(tree_stats),
+            'label_summary': self._summarize_labels(tree_stats)
         }
 
         return stats
 
-    def _count_nodes(self, node: XMLNode) -> int:
-        """Cuenta el total de nodos."""
-        count = 1
-
-        for child in node.children:
-            count += self._count_nodes(child)
-
-        return count
-
-    def _collect_unique_tags(self, node: XMLNode) -> List[str]:
-        """Recolecta todos los tags únicos."""
-        tags = {node.tag}
-
-        for child in node.children:
-            tags.update(self._collect_unique_tags(child))
-
-        return sorted(tags)
-
-    def _summarize_attributes(self, node: XMLNode) -> Dict[str, Any]:
+    def _summarize_attributes(self, tree_stats: TreeStats) -> Dict[str, Any]:
         """Resume la distribución de atributos."""
-        all_attributes = {}
-
-        def collect_attrs(current_node: XMLNode):
-            for attr_name in current_node.attributes:
-                all_attributes[attr_name] = all_attributes.get(attr_name, 0) + 1
-
-            for child in current_node.children:
-                collect_attrs(child)
-
-        collect_attrs(node)
-
         return {
-            'total_unique_attributes': len(all_attributes),
-            'most_common': dict(sorted(all_attributes.items(),
-                                       key=lambda x: x[1],
-                                       reverse=True)[:10])
+            'total_unique_attributes': len(tree_stats.attribute_counts),
+            'most_common': dict(tree_stats.attribute_counts.most_common(10))
         }
 
-    def _summarize_labels(self, node: XMLNode) -> Dict[str, Any]:
+    def _summarize_labels(self, tree_stats: TreeStats) -> Dict[str, Any]:
         """Resume la distribución de labels por idioma."""
-        language_counts = {}
-
-        def collect_labels(current_node: XMLNode):
-            for lang in current_node.labels:
-                language_counts[lang] = language_counts.get(lang, 0) + 1
-
-            for child in current_node.children:
-                collect_labels(child)
-
-        collect_labels(node)
-
         return {
-            'total_languages': len(language_counts),
-            'languages': dict(sorted(language_counts.items()))
+            'total_languages': len(tree_stats.language_counts),
+            'languages': dict(sorted(tree_stats.language_counts.items()))
         }
 
     def create_flattened_view(self, document: XMLDocument) -> List[Dict[str, Any]]:
         """
         Crea una vista aplanada del documento para fácil navegación.
+
+        Cada entrada reutiliza el subárbol normalizado correspondiente de la raíz
+        en lugar de normalizar de nuevo cada subárbol, y el breadcrumb de cada nodo
+        se construye a partir del de su padre.
         """
         flattened = []
+        root = document.root
+        stack = [(root, self._normalize_node(root), "", self._create_breadcrumb(root.parent))]
+
+        while stack:
+            current_node, normalized, path, parent_breadcrumb = stack.pop()
 
-        def flatten_node(current_node: XMLNode, path: str = ""):
             current_path = f"{path}/{current_node.tag}"
             if current_node.technical_id:
                 current_path = f"{current_path}[@id='{current_node.technical_id}']"
 
+            breadcrumb = parent_breadcrumb + [self._breadcrumb_entry(current_node)]
+
             flattened.append({
                 'path': current_path,
-                'node': self._normalize_node(current_node),
-                'breadcrumb': self._create_breadcrumb(current_node)
+                'node': normalized,
+                'breadcrumb': breadcrumb
             })
 
-            for child in current_node.children:
-                flatten_node(child, current_path)
+            children = current_node.children
+            normalized_children = normalized['children']
+            for index in range(len(children) - 1, -1, -1):
+                stack.append((children[index], normalized_children[index], current_path, breadcrumb))
 
-        flatten_node(document.root)
         return flattened
 
-    def _create_breadcrumb(self, node: XMLNode) -> List[Dict[str, str]]:
+    def _create_breadcrumb(self, node: Optional[XMLNode]) -> List[Dict[str, str]]:
         """Crea un breadcrumb desde la raíz hasta el nodo."""
         breadcrumb = []
         current = node
 
         while current:
-            breadcrumb.insert(0, {
-                'tag': current.tag,
-                'technical_id': current.technical_id,
-                'sibling_order': current.sibling_order
-            })
+            breadcrumb.append(self._breadcrumb_entry(current))
             current = current.parent
 
-        return breadcrumb
\ No newline at end of file
+        breadcrumb.reverse()
+        return breadcrumb
+
+    def _breadcrumb_entry(self, node: XMLNode) -> Dict[str, str]:
+        return {
+            'tag': node.tag,
+            'technical_id': node.technical_id,
+            'sibling_order': node.sibling_order
+        }
+
+
+def _may_be_number(value_str: str) -> bool:
+    # NUMBER_PATTERN exige que empiece por '-' o un dígito
+    first = value_str[:1]
+    return first == '-' or first.isdigit()
+
+
+def _may_be_iso_date(value_str: str) -> bool:
+    # ISO_DATE_PATTERN exige al menos AAAA-MM-DD
+    return len(value_str) >= 10 and value_str[4] == '-'
+
+
+@lru_cache(maxsize=16384)
+def _classify_value(value: str) -> Tuple[Any, bool]:
+    """
+    (valor normalizado, si la normalización es confiable) de un valor de atributo.
+
+    Los mismos literales ("true", "0", fechas...) se repiten en miles de nodos.
+    """
+    return XMLNormalizer._normalize_value(value), XMLNormalizer._is_normalization_reliable(value)
@@ -3,7 +3,14 @@
 Orchestrator para el módulo completo de parsing XML.
 Ahora con soporte para metadata persistente.
 """
-from typing import Dict, Any, List, Optional, Union
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Union, Tuple
 from pathlib import Path
 from datetime import datetime
 from .filters.xml_filter import create_hris_filter
@@ -16,6 +23,99 @@ from .utils.xml_merger import _mark_nodes_origin, _fuse_csf_with_main
 from .metadata_manager import get_metadata_manager
 
 
+# Documentos parseados recientes, guardados como pickle (inmutable: cada acierto
+# devuelve una copia independiente que se puede marcar y fusionar sin riesgo)
+_PARSE_CACHE_SIZE = 16
+_parse_cache: "OrderedDict[Tuple, bytes]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def _duplication_mapping_key(mapping: Dict[str, List[str]]) -> Tuple:
+    """Representación inmutable y ordenada de un mapeo de duplicación."""
+    return tuple(sorted(
+        (element_id, tuple(suffixes))
+        for element_id, suffixes in mapping.items()
+    ))
+
+
+def _parse_cache_key(xml_path: Union[str, Path],
+                     source_name: Optional[str],
+                     apply_hris_filter: bool,
+                     mapping_key: Tuple) -> Tuple:
+    """Clave de caché: archivo (ruta, mtime, tamaño) y todo lo que cambia el parseo."""
+    path = os.path.abspath(xml_path)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size, source_name, apply_hris_filter, mapping_key)
+
+
+def _parse_file_cached(parser: XMLParser,
+                       mapping_key: Tuple,
+                       xml_path: Union[str, Path],
+                       source_name: Optional[str],
+                       apply_hris_filter: bool) -> XMLDocument:
+    """
+    Parsea un archivo (con el filtro HRIS durante el parseo si se pide) reutilizando
+    el resultado de una ingesta anterior del mismo archivo sin cambios.
+    
+    mapping_key es _duplication_mapping_key del mapeo del parser, precalculado.
+    """
+    key = _parse_cache_key(xml_path, source_name, apply_hris_filter, mapping_key)
+    
+    with _parse_cache_lock:
+        cached = _parse_cache.get(key)
+        if cached is not None:
+            _parse_cache.move_to_end(key)
+    if cached is not None:
+        return pickle.loads(cached)
+    
+    node_filter = create_hris_filter(filter_csf=False) if apply_hris_filter else None
+    document = parser.parse_file(xml_path, source_name, node_filter)
+    
+    payload = pickle.dumps(document, protocol=pickle.HIGHEST_PROTOCOL)
+    with _parse_cache_lock:
+        _parse_cache[key] = payload
+        _parse_cache.move_to_end(key)
+        while len(_parse_cache) > _PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    
+    return document
+
+
+class _LazyNormalized(Mapping):
+    """
+    Vista de solo lectura del documento normalizado que se calcula en el primer
+    acceso (get, [], iteración...), no al cargar el documento.
+    """
+    
+    __slots__ = ('_document', '_normalizer', '_normalized')
+    
+    def __init__(self, document: XMLDocument, normalizer: XMLNormalizer):
+        self._document = document
+        self._normalizer = normalizer
+        self._normalized: Optional[Dict[str, Any]] = None
+    
+    def _materialize(self) -> Dict[str, Any]:
+        if self._normalized is None:
+            self._normalized = self._normalizer.normalize_document(self._document)
+            self._document = None
+            self._normalizer = None
+        return self._normalized
+    
+    def __getitem__(self, key: str) -> Any:
+        return self._materialize()[key]
+    
+    def __iter__(self):
+        return iter(self._materialize())
+    
+    def __len__(self) -> int:
+        return len(self._materialize())
+    
+    def __repr__(self) -> str:
+        if self._normalized is None:
+            return f"<{type(self).__name__} (sin calcular)>"
+        return repr(self._normalized)
+
+
 class XMLParsingOrchestrator:
     """
     Orquestador que maneja todo el flujo de parsing XML.
@@ -25,7 +125,8 @@ class XMLParsingOrchestrator:
                  element_duplication_mapping: Optional[Dict] = None,
                  id: Optional[str] = None,
                  cliente: Optional[str] = None,
-                 consultor: Optional[str] = None):
+                 consultor: Optional[str] = None,
+                 read_only: bool = False):
         """
         Inicializa el orquestador con parámetros para metadata.
         
@@ -34,107 +135,66 @@ class XMLParsingOrchestrator:
             id: ID único para la instancia de metadata
             cliente: Nombre del cliente
             consultor: Nombre del consultor
+            read_only: Si es True el orquestador solo carga desde metadata y
+                no reserva una versión nueva
         """
         self.loader = XMLLoader()
         self.parser = XMLParser(element_duplication_mapping)
         self.normalizer = XMLNormalizer(preserve_all_data=True)
         
+        # Clave del mapeo de duplicación para la caché de parseo (una vez por orquestador)
+        self._mapping_key = _duplication_mapping_key(self.parser.ELEMENT_DUPLICATION_MAPPING)
+        
         # Construir metadata a partir de los parámetros
         metadata_config = {
             'id': id,
             'cliente': cliente,
-            'consultor': consultor
+            'consultor': consultor,
+            'read_only': read_only
         }
         self.metadata_manager = get_metadata_manager(**metadata_config)
     
-    def parse_and_store(self,
-                       xml_path: Union[str, Path],
-                       id: str,
-                       source_name: Optional[str] = None,
-                       origin: str = 'main',
-                       metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """
-        Parsea un archivo XML y lo almacena en metadata.
-        
-        Args:
-            xml_path: Ruta al archivo XML
-            id: ID para metadata
-            source_name: Nombre identificador del origen
-            origin: Origen de los datos
-            metadata: Metadata adicional a almacenar
-            
-        Returns:
-            Diccionario con información de almacenamiento y modelo normalizado
-        """
-        # Cargar y parsear XML
-        root = self.loader.load_from_file(xml_path, source_name)
-        document = self.parser.parse_document(root, source_name)
-        
-        # Marcar origen
-        if origin != 'main':
-            _mark_nodes_origin(document.root, origin)
-        
-        # Normalizar para respuesta inmediata
-        normalized = self.normalizer.normalize_document(document)
-        
-        # Almacenar en metadata
-        storage_info = self.metadata_manager.save_document(
-            document=document,
-            id=id,
-            metadata={
-                'xml_path': str(xml_path),
-                'source_name': source_name,
-                'origin': origin,
-                **(metadata or {})
-            }
-        )
-        
-        return {
-            'storage': storage_info,
-            'normalized': normalized
-        }
-    
     def parse_fuse_and_store(self,
                             main_xml_path: Union[str, Path],
                             id: str,
                             csf_xml_paths: Optional[List[Union[str, Path]]] = None,
-                            metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                            metadata: Optional[Dict[str, Any]] = None,
+                            return_normalized: bool = True) -> Dict[str, Any]:
         """
         Parsea, fusiona y almacena múltiples archivos XML.
+        
+        Con return_normalized=False no se normaliza el documento fusionado y
+        'normalized' es None (ingesta sin respuesta inmediata).
         """
+        # Rutas como str una sola vez: se usan en el parseo y en la metadata guardada
+        main_path = os.fspath(main_xml_path)
+        csf_paths = [os.fspath(csf_path) for csf_path in (csf_xml_paths or [])]
+        
         # Preparar lista de archivos
         files = [{
-            'path': str(main_xml_path),
+            'path': main_path,
             'type': 'main',
             'source_name': 'SDM_Principal'
         }]
         
-        if csf_xml_paths:
-            for i, csf_path in enumerate(csf_xml_paths):
+        if csf_paths:
+            for i, csf_path in enumerate(csf_paths):
                 files.append({
-                    'path': str(csf_path),
+                    'path': csf_path,
                     'type': 'csf',
                     'source_name': f'CSF_SDM_{i}'
                 })
         
-        # Parsear múltiples archivos
-        loader = XMLLoader()
-        parser = XMLParser()
-        normalizer = XMLNormalizer()
+        # Parsear múltiples archivos en paralelo (orden de files preservado)
+        if len(files) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(files))) as executor:
+                documents = list(executor.map(self._parse_fusion_file, files))
+        else:
+            documents = [self._parse_fusion_file(file_info) for file_info in files]
         
-        documents = []
-        for file_info in files:
-            xml_root = loader.load_from_file(file_info['path'], file_info['source_name'])
-            document = parser.parse_document(xml_root, file_info['source_name'])
-            document.file_type = file_info['type']
-            
-            if file_info['type'] == 'main':
+        for document in documents:
+            if document.file_type == 'main' and document.root is not None:
                 _mark_nodes_origin(document.root, 'sdm')
-                # APLICAR FILTRO HRIS
-                filter_instance = create_hris_filter(filter_csf=False)
-                document = filter_instance.filter_document(document, 'main')
-            
-            documents.append(document)
         
         # Fusionar si hay múltiples documentos
         if len(documents) > 1:
@@ -142,69 +202,113 @@ class XMLParsingOrchestrator:
         else:
             fused_document = documents[0]
         
-        # Normalizar para respuesta inmediata
-        normalized = normalizer.normalize_document(fused_document)
-        
-        # Almacenar en metadata
-        storage_info = self.metadata_manager.save_document(
-            document=fused_document,
-            id=id,
-            metadata={
-                'main_xml_path': str(main_xml_path),
-                'csf_xml_paths': [str(p) for p in (csf_xml_paths or [])],
+        # Almacenar en metadata y normalizar para respuesta inmediata
+        return self._store_and_normalize(
+            fused_document,
+            id,
+            {
+                'main_xml_path': main_path,
+                'csf_xml_paths': csf_paths,
                 'file_count': len(files),
                 'filter_applied': 'hris-only',  # Registrar que se aplicó filtro
                 **(metadata or {})
-            }
+            },
+            return_normalized
         )
+    
+    def _store_and_normalize(self,
+                             document: XMLDocument,
+                             id: str,
+                             metadata: Dict[str, Any],
+                             return_normalized: bool) -> Dict[str, Any]:
+        """
+        Guarda el documento en segundo plano mientras se normaliza.
+        
+        Si la normalización falla no queda versión guardada: el guardado se
+        cancela o, si ya había empezado, se espera y se elimina su directorio.
+        """
+        pending_storage = self.metadata_manager.save_document_async(
+            document=document,
+            id=id,
+            metadata=metadata
+        )
+        
+        try:
+            # Normalizar para respuesta inmediata (solo si el llamador la usa)
+            normalized = self.normalizer.normalize_document(document) if return_normalized else None
+        except BaseException:
+            if not pending_storage.cancel():
+                try:
+                    pending_storage.result()
+                except Exception:
+                    pass
+                self.metadata_manager.discard_version(id)
+            raise
         
         return {
-            'storage': storage_info,
+            'storage': pending_storage.result(),
             'normalized': normalized
         }
     
+    def _parse_fusion_file(self, file_info: Dict[str, str]) -> XMLDocument:
+        """
+        Parsea uno de los archivos a fusionar (filtro HRIS solo para main).
+        
+        Usa un XMLParser propio con el mismo mapeo de duplicación que self.parser:
+        el parser guarda estado durante el parseo y no se comparte entre hilos.
+        """
+        document = _parse_file_cached(
+            XMLParser(self.parser.ELEMENT_DUPLICATION_MAPPING), self._mapping_key,
+            file_info['path'], file_info['source_name'], file_info['type'] == 'main'
+        )
+        document.file_type = file_info['type']
+        return document
+    
     def parse_and_store(self,
                        xml_path: Union[str, Path],
                        id: str,
                        source_name: Optional[str] = None,
                        origin: str = 'main',
-                       metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                       metadata: Optional[Dict[str, Any]] = None,
+                       return_normalized: bool = True) -> Dict[str, Any]:
         """
         Parsea un archivo XML y lo almacena en metadata.
+        
+        Args:
+            xml_path: Ruta al archivo XML
+            id: ID para metadata
+            source_name: Nombre identificador del origen
+            origin: Origen de los datos (el filtro HRIS solo se aplica a 'main')
+            metadata: Metadata adicional a almacenar
+            return_normalized: Si es False no se normaliza ('normalized' es None)
+            
+        Returns:
+            Diccionario con información de almacenamiento y modelo normalizado
         """
-        # Cargar y parsear XML
-        root = self.loader.load_from_file(xml_path, source_name)
-        document = self.parser.parse_document(root, source_name)
+        xml_path = os.fspath(xml_path)
+        
+        # Cargar y parsear XML; el filtro HRIS (solo main) se aplica durante el parseo
+        document = _parse_file_cached(
+            self.parser, self._mapping_key, xml_path, source_name, origin == 'main'
+        )
         
         # Marcar origen
         if origin != 'main':
             _mark_nodes_origin(document.root, origin)
         
-        # APLICAR FILTRO HRIS solo para documentos main
-        if origin == 'main':
-            filter_instance = create_hris_filter(filter_csf=False)
-            document = filter_instance.filter_document(document, 'main')
-        
-        # Normalizar para respuesta inmediata
-        normalized = self.normalizer.normalize_document(document)
-        
-        # Almacenar en metadata
-        storage_info = self.metadata_manager.save_document(
-            document=document,
-            id=id,
-            metadata={
-                'xml_path': str(xml_path),
+        # Almacenar en metadata y normalizar para respuesta inmediata
+        return self._store_and_normalize(
+            document,
+            id,
+            {
+                'xml_path': xml_path,
                 'source_name': source_name,
                 'origin': origin,
                 'filter_applied': 'hris-only' if origin == 'main' else 'none',
                 **(metadata or {})
-            }
+            },
+            return_normalized
         )
-        
-        return {
-            'storage': storage_info,
-            'normalized': normalized
-        }
     
     def load_from_metadata(self,
                           id: str,
@@ -219,16 +323,17 @@ class XMLParsingOrchestrator:
             normalize: Si se debe normalizar el documento cargado
             
         Returns:
-            Documento cargado (normalizado o XMLDocument)
+            Documento cargado (XMLDocument y, si normalize, su versión normalizada
+            como mapping de solo lectura calculado en el primer acceso)
         """
         # Cargar documento desde metadata
         document = self.metadata_manager.load_document(id, version)
         
         if normalize:
-            normalized = self.normalizer.normalize_document(document)
+            # La normalización se calcula al consultar 'normalized' por primera vez
             return {
                 'document': document,
-                'normalized': normalized
+                'normalized': _LazyNormalized(document, self.normalizer)
             }
         else:
             return {
@@ -255,8 +360,7 @@ class XMLParsingOrchestrator:
                          xml_path: Union[str, Path],
                          source_name: Optional[str] = None,
                          origin: str = 'main') -> Dict[str, Any]:
-        root = self.loader.load_from_file(xml_path, source_name)
-        document = self.parser.parse_document(root, source_name)
+        document = self.parser.parse_file(xml_path, source_name)
         
         if origin != 'main':
             _mark_nodes_origin(document.root, origin)
@@ -291,7 +395,8 @@ def parse_and_store_xml(main_xml_path: Union[str, Path],
                        element_duplication_mapping: Optional[Dict] = None,
                        metadata: Optional[Dict[str, Any]] = None,
                        cliente: Optional[str] = None,
-                       consultor: Optional[str] = None) -> Dict[str, Any]:
+                       consultor: Optional[str] = None,
+                       return_normalized: bool = True) -> Dict[str, Any]:
     """
     Pipeline completo con almacenamiento en metadata.
     
@@ -303,6 +408,7 @@ def parse_and_store_xml(main_xml_path: Union[str, Path],
         metadata: Metadata adicional
         cliente: Nombre del cliente
         consultor: Nombre del consultor
+        return_normalized: Si es False se omite la normalización ('normalized' es None)
         
     Returns:
         Dict con 'storage' (info metadata) y 'normalized' (modelo)
@@ -320,7 +426,8 @@ def parse_and_store_xml(main_xml_path: Union[str, Path],
             main_xml_path=main_xml_path,
             id=id,
             csf_xml_paths=csf_paths,
-            metadata=metadata
+            metadata=metadata,
+            return_normalized=return_normalized
         )
     else:
         return orchestrator.parse_and_store(
@@ -328,7 +435,8 @@ def parse_and_store_xml(main_xml_path: Union[str, Path],
             id=id,
             source_name='SDM_Principal',
             origin='main',
-            metadata=metadata
+            metadata=metadata,
+            return_normalized=return_normalized
         )
 
 
@@ -350,9 +458,24 @@ def load_from_metadata(id: str,
     Returns:
         Documento cargado
     """
-    orchestrator = create_orchestrator(
+    orchestrator = _get_loading_orchestrator(id, cliente, consultor)
+    return orchestrator.load_from_metadata(id, version, normalize)
+
+
+@lru_cache(maxsize=128)
+def _get_loading_orchestrator(id: str,
+                              cliente: Optional[str],
+                              consultor: Optional[str]) -> XMLParsingOrchestrator:
+    """
+    Orquestador reutilizable para cargas: solo lee metadata, así que se crea de
+    solo lectura y no reserva ninguna versión (.next_version).
+    
+    Las ingestas siguen creando su propio orquestador: cada una guarda en una
+    versión distinta.
+    """
+    return XMLParsingOrchestrator(
         id=id,
         cliente=cliente,
-        consultor=consultor
-    )
-    return orchestrator.load_from_metadata(id, version, normalize)
\ No newline at end of file
+        consultor=consultor,
+        read_only=True
+    )
\ No newline at end of file
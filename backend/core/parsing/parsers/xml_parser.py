@@ -1,10 +1,17 @@
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 import xml.etree.ElementTree as ET
+import multiprocessing
+import os
 import re
-from ..filters.xml_filter import create_hris_filter 
+import sys
+from ..filters.xml_filter import XMLFilter, create_hris_filter
 
-from ..models.xml_elements import XMLNode, XMLDocument, NodeType
+from ..models.xml_elements import XMLNode, XMLDocument, NodeType, default_technical_id
 from ..loaders.xml_loader import XMLLoader
+from ..exceptions.xml_exceptions import XMLValidationError
 from ..normalizers.xml_normalizer import XMLNormalizer
 from ..utils.xml_merger import (
     _fuse_csf_with_main,
@@ -12,16 +19,51 @@ from ..utils.xml_merger import (
 )
 
 
+class _DroppedNode:
+    """Hueco de un hijo descartado por el filtro durante el parseo en streaming."""
+    __slots__ = ('sibling_order',)
+
+
+_DROPPED = _DroppedNode()
+
+# Los valores de atributo más cortos que esto se internan (ids, flags, tipos)
+_INTERN_VALUE_MAX_LENGTH = 64
+
+
+@lru_cache(maxsize=4096)
+def _split_ns(tag: str) -> Tuple[str, str]:
+    # Solo para nombres '{ns}local' (tags y claves de atributo): se repiten en
+    # todo el documento. Sin namespace el 'in' previo es más barato que la caché
+    ns_url, local_name = tag[1:].split('}', 1)
+    return ns_url, sys.intern(local_name)
+
+
+@lru_cache(maxsize=1024)
+def _is_label_tag(tag: str) -> bool:
+    # Parte de _is_label_element que solo depende del tag: una vez por tag distinto
+    return XMLParser.LABEL_ANY_RE.search(tag.lower()) is not None
+
+
+@lru_cache(maxsize=1024)
+def _is_hris_element_tag(tag: str) -> bool:
+    # Hay pocos tags distintos: la regex se evalúa una vez por tag, no por nodo
+    return XMLParser.HRIS_ELEMENT_PATTERN.match(tag) is not None
+
+
 class XMLParser:
-    LABEL_PATTERNS = {
-        'label': re.compile(r'.*[Ll]abel.*'),
-        'description': re.compile(r'.*[Dd]esc.*'),
-        'name': re.compile(r'.*[Nn]ame.*'),
-        'title': re.compile(r'.*[Tt]itle.*')
-    }
+    # Una sola alternancia en lugar de cuatro regex '.*palabra.*' evaluadas por separado
+    LABEL_ANY_RE = re.compile(r'[Ll]abel|[Dd]esc|[Nn]ame|[Tt]itle')
 
     LANGUAGE_PATTERN = re.compile(r'^[a-z]{2}(-[A-Za-z]{2,})?$')
+    LANG_SUFFIX_PATTERN = re.compile(r'_([a-z]{2}(?:-[A-Za-z]{2,})?)$', re.IGNORECASE)
+    LANG_KEY_RE = re.compile(r'lang|language|locale', re.IGNORECASE)
     HRIS_ELEMENT_PATTERN = re.compile(r'.*hris.*element.*', re.IGNORECASE)
+    # Elementos y atributos con namespace (el de xml ya está registrado siempre)
+    NAMESPACED_NAMES_XPATH = (
+        'descendant-or-self::*[namespace-uri() != ""]'
+        ' | descendant-or-self::*/@*[namespace-uri() != ""'
+        ' and namespace-uri() != "http://www.w3.org/XML/1998/namespace"]'
+    )
 
     ELEMENT_FIELD_MAPPING = {
         'personalInfo': 'start-date',
@@ -48,6 +90,13 @@ class XMLParser:
         if element_duplication_mapping is not None:
             self.ELEMENT_DUPLICATION_MAPPING = element_duplication_mapping
 
+        # Todos los '_sufijo' del mapeo, para descartar con un solo endswith en C
+        self._duplication_suffixes = tuple(
+            f"_{suffix}"
+            for suffixes in self.ELEMENT_DUPLICATION_MAPPING.values()
+            for suffix in suffixes
+        )
+
     def parse_document(self,
                     root: ET.Element,
                     source_name: Optional[str] = None) -> XMLDocument:
@@ -78,18 +127,180 @@ class XMLParser:
 
         return document
 
-    def _parse_element(self,
-                       element: ET.Element,
-                       parent: Optional[XMLNode],
-                       sibling_order: int,
-                       depth: int,
-                       namespaces: Dict[str, str]) -> XMLNode:
+    def parse_file(self,
+                   file_path: Union[str, Path],
+                   source_name: Optional[str] = None,
+                   node_filter: Optional[XMLFilter] = None) -> XMLDocument:
+        """
+        Carga y parsea un archivo, en streaming si supera el umbral del loader.
+
+        Con node_filter el documento se filtra durante el propio parseo (una sola
+        pasada): los subárboles descartados nunca llegan a formar parte del árbol.
+        """
+        if node_filter is not None or XMLLoader.should_stream(file_path):
+            events = XMLLoader.iterparse_file(file_path, source_name)
+            return self.parse_document_streaming(events, source_name, node_filter)
+
+        root = XMLLoader.load_from_file(file_path, source_name)
+        return self.parse_document(root, source_name)
+
+    def parse_document_streaming(self,
+                                 events: Iterable[Tuple[str, Any]],
+                                 source_name: Optional[str] = None,
+                                 node_filter: Optional[XMLFilter] = None) -> XMLDocument:
+        """
+        Construye el documento a partir de eventos ('start', 'end') de iterparse.
+
+        Produce el mismo árbol que parse_document, pero cada nodo se crea al cerrar
+        su elemento y el elemento se libera en cuanto deja de ser necesario, de modo
+        que el árbol lxml nunca está completo en memoria.
+
+        Con node_filter produce el mismo resultado que node_filter.filter_document
+        sobre el documento completo: cada nodo se evalúa al cerrarse y los que no
+        se conservan no se enlazan a su padre.
+        """
+        self._current_depth = 0
+        self._node_count = 0
+        self._elements_to_process = []
+
+        namespaces = {'xml': 'http://www.w3.org/XML/1998/namespace'}
+        version, encoding = None, None
+        root_node = None
+        root_retained = root_duplicated = False
+
+        # Cada frame: [elemento, hijos construidos, dentro de un label, es label, orden pre-order,
+        #              dentro de un elemento a duplicar, conserva hijos, tiene hijos a duplicar]
+        stack = []
+        order = 0
+        # Elemento ya convertido en nodo; se libera en el siguiente evento, cuando su tail ya existe
+        released = None
+        # Padres con huecos de hijos descartados: (padre, ids de hijos ya filtrados)
+        placeholder_parents = []
+
+        for event, element in events:
+            if released is not None:
+                self._release_streamed_element(*released)
+                released = None
+
+            if event == 'start':
+                self._register_namespaces(element, namespaces)
+
+                in_duplicated = False
+                if stack:
+                    parent_frame = stack[-1]
+                    if parent_frame[3] is None:
+                        parent_frame[3] = self._is_label_element(
+                            self._extract_tag_name(parent_frame[0]), parent_frame[0]
+                        )
+                    skipped = parent_frame[2] or parent_frame[3]
+                    in_duplicated = parent_frame[5]
+                else:
+                    version, encoding = self._extract_xml_declaration_metadata(element)
+                    skipped = False
+
+                # Los elementos a duplicar se construyen completos y se filtran tras duplicarse
+                if node_filter is not None and not skipped and not in_duplicated:
+                    in_duplicated = self._element_id(element) in self.ELEMENT_DUPLICATION_MAPPING
+
+                stack.append([element, [], skipped, None, order, in_duplicated, False, False])
+                order += 1
+                continue
+
+            (_, children, skipped, is_label, preorder,
+             in_duplicated, has_retained, has_duplicated) = stack.pop()
+            if skipped:
+                continue
+
+            tag = self._extract_tag_name(element)
+            if stack:
+                if is_label is None:
+                    is_label = self._is_label_element(tag, element)
+                if is_label:
+                    # Se conserva intacto: el padre lo necesita para extraer sus labels
+                    continue
+
+            node, retained = self._build_streamed_node(
+                element, tag, children, len(stack), preorder, namespaces,
+                node_filter, in_duplicated, has_retained, has_duplicated
+            )
+            released = (node, element)
+
+            if has_duplicated and not in_duplicated:
+                placeholder_parents.append(
+                    (node, {id(child) for child in node.children if child is not _DROPPED})
+                )
+
+            if stack:
+                parent_frame = stack[-1]
+                if node_filter is None or retained or in_duplicated:
+                    parent_frame[1].append(node)
+                else:
+                    parent_frame[1].append(_DROPPED)
+                if retained:
+                    parent_frame[6] = True
+                if in_duplicated and not parent_frame[5]:
+                    parent_frame[7] = True
+            else:
+                root_node = node
+                root_retained = retained
+                root_duplicated = in_duplicated
+
+        if released is not None:
+            self._release_streamed_element(*released)
+
+        if root_node is None:
+            raise XMLValidationError("Empty XML document", source_name)
+
+        # Al cerrar el documento cada nodo ya conoce su padre y su posición;
+        # se duplica en el mismo orden que el recorrido recursivo (pre-order)
+        for item in self._elements_to_process:
+            item['parent'] = item['node'].parent
+            item['sibling_order'] = item['node'].sibling_order
+        self._elements_to_process.sort(key=lambda item: item['preorder'])
+        self._process_element_duplications()
+
+        if node_filter is not None:
+            # Los huecos solo servían para renumerar como en el árbol completo;
+            # las copias duplicadas se filtran ahora
+            for parent, prefiltered in placeholder_parents:
+                parent.children = [
+                    child for child in parent.children
+                    if child is not _DROPPED
+                    and (id(child) in prefiltered or self._prune_unretained(child, node_filter))
+                ]
+
+            if root_duplicated:
+                root_retained = self._prune_unretained(root_node, node_filter)
+            if not root_retained:
+                root_node = None
+
+        return XMLDocument(
+            root=root_node,
+            source_name=source_name,
+            namespaces=namespaces,
+            version=version,
+            encoding=encoding
+        )
+
+    def _build_streamed_node(self,
+                             element: ET.Element,
+                             tag: str,
+                             children: List[XMLNode],
+                             depth: int,
+                             preorder: int,
+                             namespaces: Dict[str, str],
+                             node_filter: Optional[XMLFilter] = None,
+                             in_duplicated: bool = False,
+                             has_retained: bool = False,
+                             has_duplicated: bool = False) -> Tuple[XMLNode, bool]:
         self._node_count += 1
 
-        tag = self._extract_tag_name(element)
         attributes = self._extract_attributes(element)
         labels = self._extract_labels(element, attributes, namespaces)
-        namespace = self._extract_namespace(element, namespaces)
+
+        text_content = None
+        if element.text:
+            text_content = element.text.strip() or None
 
         node = XMLNode(
             tag=tag,
@@ -97,11 +308,11 @@ class XMLParser:
             attributes=attributes,
             labels=labels,
             children=[],
-            parent=parent,
+            parent=None,
             depth=depth,
-            sibling_order=sibling_order,
-            namespace=namespace,
-            text_content=self._extract_text_content(element),
+            sibling_order=0,
+            namespace=self._extract_namespace(element, namespaces),
+            text_content=text_content,
             node_type=NodeType.UNKNOWN
         )
 
@@ -109,9 +320,10 @@ class XMLParser:
         if should_duplicate:
             self._elements_to_process.append({
                 'node': node,
-                'parent': parent,
+                'parent': None,
                 'suffixes': suffixes,
-                'sibling_order': sibling_order
+                'sibling_order': 0,
+                'preorder': preorder
             })
 
         should_inject, field_id = self._should_inject_start_date_field(node)
@@ -121,24 +333,146 @@ class XMLParser:
             date_field.depth = depth + 1
             date_field.sibling_order = 0
             node.children.append(date_field)
+            if node_filter is not None and node_filter.retains(date_field, False):
+                has_retained = True
+
+        # La posición de cada hijo es la que tendría en el árbol sin filtrar
+        for child_index, child_node in enumerate(children):
+            if child_node is _DROPPED:
+                if has_duplicated:
+                    node.children.append(child_node)
+                continue
+            child_node.parent = node
+            child_node.sibling_order = child_index
+            node.children.append(child_node)
+
+        retained = node_filter is None or node_filter.retains(node, has_retained)
+        return node, retained
+
+    def _element_id(self, element: ET.Element) -> str:
+        # Mismo id que usará _should_duplicate_element sobre el nodo construido:
+        # technical_id por defecto (id/technicalId/name/code) y, si falta, 'id'
+        attributes = element.attrib
+        if any('}' in key for key in attributes):
+            attributes = self._extract_attributes(element)
+        return default_technical_id(attributes) or attributes.get('id', '')
+
+    def _prune_unretained(self, node: XMLNode, node_filter: XMLFilter) -> bool:
+        """
+        Aplica el filtro en sitio sobre un subárbol construido completo.
+
+        Returns:
+            Si el nodo se conserva
+        """
+        stack = [(node, False)]
+        retained_nodes = set()
+
+        while stack:
+            current, visited = stack.pop()
+            if current.children and not visited:
+                stack.append((current, True))
+                stack.extend((child, False) for child in reversed(current.children))
+                continue
 
-        child_index = 0
-        for i, child_elem in enumerate(element):
-            child_tag = self._extract_tag_name(child_elem)
-            if not self._is_label_element(child_tag, child_elem):
-                child_node = self._parse_element(
-                    element=child_elem,
-                    parent=node,
-                    sibling_order=child_index,
-                    depth=depth + 1,
-                    namespaces=namespaces
-                )
-                node.children.append(child_node)
-                child_index += 1
+            if current.children:
+                current.children = [
+                    child for child in current.children if id(child) in retained_nodes
+                ]
+            if node_filter.retains(current, bool(current.children)):
+                retained_nodes.add(id(current))
+
+        return id(node) in retained_nodes
+
+    def _release_streamed_element(self, node: XMLNode, element: ET.Element):
+        if node.text_content is None and element.tail:
+            node.text_content = element.tail.strip() or None
 
-        return node
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            parent.remove(element)
+
+    def _parse_element(self,
+                       element: ET.Element,
+                       parent: Optional[XMLNode],
+                       sibling_order: int,
+                       depth: int,
+                       namespaces: Dict[str, str]) -> XMLNode:
+        """
+        Construye el subárbol de element en un recorrido pre-order iterativo (sin
+        un frame de Python por nodo ni límite de recursión).
+
+        Cada nodo se crea al sacarlo de la pila y se añade a su padre en ese
+        momento; los hijos se apilan en orden inverso, así que el orden de los
+        hijos y el de _elements_to_process son los del recorrido recursivo.
+        """
+        root_node = None
+        # El tag de cada hijo ya se extrae al decidir si es un label: viaja en la pila
+        stack = [(element, self._extract_tag_name(element), parent, sibling_order, depth)]
+
+        while stack:
+            element, tag, parent, sibling_order, depth = stack.pop()
+            self._node_count += 1
+
+            attributes = self._extract_attributes(element)
+            labels = self._extract_labels(element, attributes, namespaces)
+            namespace = self._extract_namespace(element, namespaces)
+
+            node = XMLNode(
+                tag=tag,
+                technical_id=None,
+                attributes=attributes,
+                labels=labels,
+                children=[],
+                parent=parent,
+                depth=depth,
+                sibling_order=sibling_order,
+                namespace=namespace,
+                text_content=self._extract_text_content(element),
+                node_type=NodeType.UNKNOWN
+            )
+
+            if root_node is None:
+                root_node = node
+            else:
+                parent.children.append(node)
+
+            should_duplicate, suffixes = self._should_duplicate_element(node)
+            if should_duplicate:
+                self._elements_to_process.append({
+                    'node': node,
+                    'parent': parent,
+                    'suffixes': suffixes,
+                    'sibling_order': sibling_order
+                })
+
+            should_inject, field_id = self._should_inject_start_date_field(node)
+            if should_inject:
+                date_field = self._create_date_field_node(field_id)
+                date_field.parent = node
+                date_field.depth = depth + 1
+                date_field.sibling_order = 0
+                node.children.append(date_field)
+
+            pending = []
+            child_index = 0
+            for child_elem in element:
+                child_tag = self._extract_tag_name(child_elem)
+                if not self._is_label_element(child_tag, child_elem):
+                    pending.append((child_elem, child_tag, node, child_index, depth + 1))
+                    child_index += 1
+            pending.reverse()
+            stack.extend(pending)
+
+        return root_node
 
     def _process_element_duplications(self):
+        # Reemplazos agrupados por padre (id(nodo) -> duplicados): cada lista de
+        # hijos se reconstruye y renumera una sola vez, no una vez por duplicación.
+        # Diferirlo no cambia los clones: en pre-orden ningún elemento posterior
+        # contiene a uno anterior.
+        replacements_by_parent = {}
+
         for item in self._elements_to_process:
             node = item['node']
             parent = item['parent']
@@ -156,52 +490,67 @@ class XMLParser:
                 duplicated = self._duplicate_element_with_suffix(
                     node, 
                     suffix,
-                    parent
+                    parent,
+                    base_id
                 )
                 duplicated.sibling_order = current_sibling_order
                 duplicated.depth = node.depth
                 current_sibling_order += 1
                 all_nodes.append(duplicated)
 
-            self._replace_node_in_parent(parent, node, all_nodes)
+            entry = replacements_by_parent.get(id(parent))
+            if entry is None:
+                entry = replacements_by_parent[id(parent)] = (parent, {})
+            entry[1][id(node)] = all_nodes
+
+        for parent, replacements in replacements_by_parent.values():
+            self._replace_nodes_in_parent(parent, replacements)
 
     def _should_duplicate_element(self, node: XMLNode) -> tuple[bool, list]:
         element_id = node.technical_id or node.attributes.get('id', '')
         
-        if element_id and element_id in self.ELEMENT_DUPLICATION_MAPPING:
-            suffixes = self.ELEMENT_DUPLICATION_MAPPING[element_id]
-            return True, suffixes
+        if element_id:
+            suffixes = self.ELEMENT_DUPLICATION_MAPPING.get(element_id)
+            if suffixes is not None:
+                return True, suffixes
         
         return False, []
 
-    def _deep_clone_node(self, node: XMLNode, parent: Optional[XMLNode] = None) -> XMLNode:
-        cloned = XMLNode(
-            tag=node.tag,
-            technical_id=node.technical_id,
-            attributes=node.attributes.copy(),
-            labels=node.labels.copy(),
-            children=[],
-            parent=parent,
-            depth=node.depth,
-            sibling_order=node.sibling_order,
-            namespace=node.namespace,
-            text_content=node.text_content,
-            node_type=node.node_type
-        )
-        
-        for i, child in enumerate(node.children):
-            cloned_child = self._deep_clone_node(child, cloned)
-            cloned_child.sibling_order = i
-            cloned.children.append(cloned_child)
-        
-        return cloned
+    def _deep_clone_node(self,
+                         node: XMLNode,
+                         parent: Optional[XMLNode] = None,
+                         suffix: Optional[str] = None,
+                         base_id: Optional[str] = None) -> XMLNode:
+        # Recorrido iterativo: (nodo original, padre de la copia, posición entre hermanos).
+        # Con suffix, los ids de los descendientes se actualizan en la misma pasada;
+        # la raíz la actualiza quien llama, después de asignarle su nuevo id.
+        cloned_root = None
+        stack = [(node, parent, None)]
+
+        while stack:
+            current, cloned_parent, index = stack.pop()
+            cloned = current.copy_without_children(cloned_parent, index)
+
+            if cloned_root is None:
+                cloned_root = cloned
+            else:
+                cloned_parent.children.append(cloned)
+                if suffix is not None:
+                    self._update_cloned_node_ids(cloned, suffix, base_id)
+
+            children = current.children
+            stack.extend((children[i], cloned, i) for i in range(len(children) - 1, -1, -1))
+
+        return cloned_root
 
     def _duplicate_element_with_suffix(self, 
                                     original_node: XMLNode, 
                                     suffix: str, 
-                                    parent: Optional[XMLNode] = None) -> XMLNode:
-        duplicated = self._deep_clone_node(original_node, parent)
-        base_id = self._get_base_id(original_node)
+                                    parent: Optional[XMLNode] = None,
+                                    base_id: Optional[str] = None) -> XMLNode:
+        if base_id is None:
+            base_id = self._get_base_id(original_node)
+        duplicated = self._deep_clone_node(original_node, parent, suffix, base_id)
         new_id = f"{base_id}_{suffix}"
         
         duplicated.technical_id = new_id
@@ -224,13 +573,18 @@ class XMLParser:
                 if duplicated.labels[lang]:
                     duplicated.labels[lang] = f"{duplicated.labels[lang]} ({suffix})"
         
-        self._update_ids_in_cloned_tree(duplicated, suffix, base_id)
+        self._update_cloned_node_ids(duplicated, suffix, base_id)
         
         return duplicated
 
     def _get_base_id(self, node: XMLNode) -> str:
         original_id = node.technical_id or node.attributes.get('id', '')
         
+        # Sin un sufijo del mapeo y al menos dos '_' ninguna regla cambia el id
+        # (la igualdad con una clave también devuelve original_id)
+        if not original_id.endswith(self._duplication_suffixes) or original_id.count('_') < 2:
+            return original_id
+        
         for element_id, suffixes in self.ELEMENT_DUPLICATION_MAPPING.items():
             if original_id == element_id:
                 return element_id
@@ -243,7 +597,7 @@ class XMLParser:
         
         return original_id
 
-    def _update_ids_in_cloned_tree(self, node: XMLNode, suffix: str, base_id: str):
+    def _update_cloned_node_ids(self, node: XMLNode, suffix: str, base_id: str):
         current_id = node.technical_id or node.attributes.get('id', '')
         
         if current_id and base_id in current_id:
@@ -264,7 +618,7 @@ class XMLParser:
                 orig_original_id = node.attributes['data-original-id']
                 if base_id in orig_original_id:
                     orig_parts = orig_original_id.split('_')
-                    if len(orig_parts) > 1 and any(s in orig_parts[-1] for s in ['csf', 'sdm']):
+                    if len(orig_parts) > 1 and ('csf' in orig_parts[-1] or 'sdm' in orig_parts[-1]):
                         node.attributes['data-original-id'] = f"{orig_parts[0]}_{suffix}_{orig_parts[-1]}"
                     else:
                         node.attributes['data-original-id'] = f"{orig_parts[0]}_{suffix}"
@@ -273,30 +627,26 @@ class XMLParser:
                 full_id = node.attributes['data-full-id']
                 if base_id in full_id:
                     node.attributes['data-full-id'] = full_id.replace(base_id, f"{base_id}_{suffix}")
-        
-        for child in node.children:
-            self._update_ids_in_cloned_tree(child, suffix, base_id)
 
-    def _replace_node_in_parent(self, 
-                               parent: XMLNode, 
-                               original: XMLNode, 
-                               replacements: List[XMLNode]):
+    def _replace_nodes_in_parent(self,
+                                 parent: XMLNode,
+                                 replacements: Dict[int, List[XMLNode]]):
         if not parent:
             return
 
         new_children = []
-        replaced = False
-        
+
         for child in parent.children:
-            if child == original:
-                new_children.extend(replacements)
-                replaced = True
-            else:
+            replacement = replacements.pop(id(child), None)
+            if replacement is None:
                 new_children.append(child)
-        
-        if not replaced:
-            new_children.extend(replacements)
-        
+            else:
+                new_children.extend(replacement)
+
+        # Originales que ya no cuelgan del padre: sus duplicados van al final
+        for replacement in replacements.values():
+            new_children.extend(replacement)
+
         parent.children = new_children
         
         for i, child in enumerate(parent.children):
@@ -305,17 +655,24 @@ class XMLParser:
     def _extract_tag_name(self, element: ET.Element) -> str:
         tag = element.tag
         if '}' in tag:
-            tag = tag.split('}', 1)[1]
+            return _split_ns(tag)[1]
         return tag
 
     def _extract_attributes(self, element: ET.Element) -> Dict[str, str]:
+        # Las claves y los valores cortos ("true", "both", "string"...) se internan:
+        # se repiten en miles de nodos (y en el pickle). Los largos no se internan.
+        # Los atributos con namespace se guardan también como '{ns}clave': los
+        # labels 'attr_{ns}...' y el tipo de nodo (la URI del namespace puede
+        # contener un indicador, p. ej. 'name' en xml:lang) dependen de esa forma
         attributes = {}
         for key, value in element.attrib.items():
+            if len(value) < _INTERN_VALUE_MAX_LENGTH:
+                value = sys.intern(value)
             if '}' in key:
-                attributes[key] = value
-                attributes[key.split('}', 1)[1]] = value
+                attributes[sys.intern(key)] = value
+                attributes[_split_ns(key)[1]] = value
             else:
-                attributes[key] = value
+                attributes[sys.intern(key)] = value
         return attributes
 
     def _extract_labels(self,
@@ -323,33 +680,45 @@ class XMLParser:
                         attributes: Dict[str, str],
                         namespaces: Dict[str, str]) -> Dict[str, str]:
         labels: Dict[str, str] = {}
+        # Un solo recorrido de los atributos: las entradas 'attr_*' se guardan
+        # aparte para añadirlas al final, en el mismo orden que antes
+        attr_labels = []
 
         for attr_name, attr_value in attributes.items():
             is_label = False
             language = None
 
-            for pattern in self.LABEL_PATTERNS.values():
-                if pattern.match(attr_name):
-                    is_label = True
-                    parts = attr_name.split('_')
-                    if len(parts) > 1:
-                        possible_lang = parts[-1]
-                        if '-' in possible_lang or len(possible_lang) in [2, 5, 8]:
-                            language = possible_lang
-                    break
+            if self.LABEL_ANY_RE.search(attr_name):
+                is_label = True
+                parts = attr_name.split('_')
+                if len(parts) > 1:
+                    possible_lang = parts[-1]
+                    if '-' in possible_lang or len(possible_lang) in [2, 5, 8]:
+                        language = possible_lang
 
             if not is_label:
-                lang_suffix_pattern = re.compile(r'_([a-z]{2}(?:-[A-Za-z]{2,})?)$', re.IGNORECASE)
-                match = lang_suffix_pattern.search(attr_name)
+                match = self.LANG_SUFFIX_PATTERN.search(attr_name)
                 if match:
                     is_label = True
                     language = match.group(1)
 
-            if is_label and attr_value and attr_value.strip():
+            if not attr_value:
+                continue
+
+            value = attr_value.strip()
+
+            if is_label and value:
                 if language:
-                    labels[language.lower()] = attr_value.strip()
+                    labels[sys.intern(language.lower())] = value
                 else:
-                    labels[f"label_{attr_name}"] = attr_value.strip()
+                    labels[f"label_{attr_name}"] = value
+
+            # 'language' contiene 'lang': basta una sola comprobación
+            if (len(value) > 3 and
+                    value != value.upper() and
+                    (' ' in attr_value or attr_value[0].isupper()) and
+                    'lang' not in attr_name.lower()):
+                attr_labels.append((f"attr_{attr_name}", value))
 
         for child in element:
             child_tag = self._extract_tag_name(child)
@@ -361,41 +730,36 @@ class XMLParser:
                 child_attrs = self._extract_attributes(child)
                 language = None
                 for attr_key, attr_value in child_attrs.items():
-                    attr_name_lower = attr_key.lower()
-                    if any(lang_word in attr_name_lower for lang_word in ['lang', 'language', 'locale']):
+                    if self.LANG_KEY_RE.search(attr_key):
                         if attr_value:
                             language = attr_value.lower()
                         break
                 
                 if language:
-                    labels[language] = label_text
+                    labels[sys.intern(language)] = label_text
                 else:
                     labels['default'] = label_text
 
-        for attr_name, attr_value in attributes.items():
-            if (attr_value and
-                    len(attr_value.strip()) > 3 and
-                    attr_value.strip() != attr_value.strip().upper() and
-                    (' ' in attr_value or attr_value[0].isupper())):
-                
-                if 'lang' in attr_name.lower() or 'language' in attr_name.lower():
-                    continue
-                
-                labels[f"attr_{attr_name}"] = attr_value.strip()
+        for key, value in attr_labels:
+            labels[key] = value
 
         return labels
 
     def _is_label_element(self, tag_name: str, element: ET.Element) -> bool:
-        tag_lower = tag_name.lower()
-        if any(pattern.match(tag_lower) for pattern in self.LABEL_PATTERNS.values()):
+        if _is_label_tag(tag_name):
             return True
 
-        if element.text and element.text.strip():
-            text = element.text.strip()
+        # lxml crea un str nuevo en cada acceso a .text: se lee una sola vez
+        text = element.text
+        if text:
+            text = text.strip()
             if 2 <= len(text) <= 100 and not text.startswith('http'):
-                attrs = self._extract_attributes(element)
-                if any('lang' in key.lower() or 'language' in key.lower() for key in attrs.keys()):
-                    return True
+                # Claves en crudo, sin construir el dict de atributos que
+                # _parse_element extraerá de nuevo: '{uri}clave' contiene el
+                # nombre local y también cuenta la URI, como en ese dict
+                for key in element.attrib:
+                    if 'lang' in key.lower():
+                        return True
         return False
 
     def _extract_text_content(self, element: ET.Element) -> Optional[str]:
@@ -412,8 +776,9 @@ class XMLParser:
     def _extract_namespace(self,
                            element: ET.Element,
                            namespaces: Dict[str, str]) -> Optional[str]:
-        if '}' in element.tag:
-            ns_url = element.tag.split('}', 1)[0][1:]
+        tag = element.tag
+        if '}' in tag:
+            ns_url = _split_ns(tag)[0]
             for prefix, url in namespaces.items():
                 if url == ns_url:
                     return prefix
@@ -424,31 +789,42 @@ class XMLParser:
         namespaces = {}
         namespaces['xml'] = 'http://www.w3.org/XML/1998/namespace'
 
-        def extract_from_element(elem: ET.Element):
-            if '}' in elem.tag:
-                ns_url = elem.tag.split('}', 1)[0][1:]
+        if hasattr(root, 'xpath'):
+            # lxml: libxml2 devuelve en orden de documento (elemento y luego sus
+            # atributos) solo los nombres con namespace, sin recorrer en Python
+            # el resto del árbol. Los prefijos ns{N} salen en el mismo orden
+            for item in root.xpath(self.NAMESPACED_NAMES_XPATH):
+                qualified_name = item.attrname if getattr(item, 'is_attribute', False) else item.tag
+                ns_url = _split_ns(qualified_name)[0]
                 if ns_url not in namespaces.values():
-                    prefix = f"ns{len(namespaces)}"
-                    namespaces[prefix] = ns_url
+                    namespaces[f"ns{len(namespaces)}"] = ns_url
+            return namespaces
 
-            for key, value in elem.attrib.items():
-                if '}' in key:
-                    ns_url = key.split('}', 1)[0][1:]
-                    if ns_url not in namespaces.values():
-                        prefix = f"ns{len(namespaces)}"
-                        namespaces[prefix] = ns_url
+        # iter() recorre en pre-orden igual que la recursión, sin límite de profundidad
+        for elem in root.iter():
+            self._register_namespaces(elem, namespaces)
 
-                if key.startswith('xmlns:'):
-                    prefix = key.split(':', 1)[1]
-                    namespaces[prefix] = value
-                elif key == 'xmlns':
-                    namespaces['default'] = value
+        return namespaces
 
-            for child in elem:
-                extract_from_element(child)
+    def _register_namespaces(self, elem: ET.Element, namespaces: Dict[str, str]):
+        if '}' in elem.tag:
+            ns_url = _split_ns(elem.tag)[0]
+            if ns_url not in namespaces.values():
+                prefix = f"ns{len(namespaces)}"
+                namespaces[prefix] = ns_url
 
-        extract_from_element(root)
-        return namespaces
+        for key, value in elem.attrib.items():
+            if '}' in key:
+                ns_url = _split_ns(key)[0]
+                if ns_url not in namespaces.values():
+                    prefix = f"ns{len(namespaces)}"
+                    namespaces[prefix] = ns_url
+
+            if key.startswith('xmlns:'):
+                prefix = key.split(':', 1)[1]
+                namespaces[prefix] = value
+            elif key == 'xmlns':
+                namespaces['default'] = value
 
     def _extract_xml_declaration_metadata(self, root: ET.Element) -> Tuple[Optional[str], Optional[str]]:
         version = None
@@ -462,13 +838,14 @@ class XMLParser:
         return version, encoding
 
     def _should_inject_start_date_field(self, node: XMLNode) -> tuple[bool, str]:
-        if not self.HRIS_ELEMENT_PATTERN.match(node.tag):
+        if not _is_hris_element_tag(node.tag):
             return False, ""
         
         element_id = node.technical_id or node.attributes.get('id')
-        if element_id and element_id in self.ELEMENT_FIELD_MAPPING:
-            field_id = self.ELEMENT_FIELD_MAPPING[element_id]
-            return True, field_id
+        if element_id:
+            field_id = self.ELEMENT_FIELD_MAPPING.get(element_id)
+            if field_id is not None:
+                return True, field_id
         
         return False, ""
     
@@ -525,31 +902,53 @@ class XMLParser:
         return base_labels
 
 
+# Por debajo de este tamaño total el arranque de procesos no compensa
+_PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# spawn y no fork (el defecto en Linux): el proceso puede tener hilos vivos
+# (_IO_POOL, _SAVE_QUEUE de metadata) y un fork con un lock tomado bloquea al hijo
+_POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _parse_one_file(file_info: Dict[str, str]) -> XMLDocument:
+    # A nivel de módulo para poder ejecutarse en otro proceso
+    file_path = file_info['path']
+    file_type = file_info.get('type', 'main')
+    source_name = file_info.get('source_name', file_path)
+    
+    # APLICAR FILTRO HRIS (solo para archivos main), durante el propio parseo
+    node_filter = create_hris_filter(filter_csf=False) if file_type == 'main' else None
+    document = XMLParser().parse_file(file_path, source_name, node_filter)
+    document.file_type = file_type
+    
+    if file_type == 'main' and document.root is not None:
+        _mark_nodes_origin(document.root, 'sdm')
+    
+    return document
+
+
+def _should_parse_in_parallel(files: List[Dict[str, str]], workers: int) -> bool:
+    if workers < 2:
+        return False
+    try:
+        total_size = sum(os.path.getsize(file_info['path']) for file_info in files)
+    except OSError:
+        # El error real (archivo inexistente...) lo da el parseo
+        return False
+    return total_size >= _PARALLEL_MIN_BYTES
+
+
 def parse_multiple_xml_files(files: List[Dict[str, str]]) -> Dict[str, Any]:
-    loader = XMLLoader()
-    parser = XMLParser()
     normalizer = XMLNormalizer()
     
-    documents = []
-    
-    for file_info in files:
-        file_path = file_info['path']
-        file_type = file_info.get('type', 'main')
-        source_name = file_info.get('source_name', file_path)
-        
-        xml_root = loader.load_from_file(file_path, source_name)
-        document = parser.parse_document(xml_root, source_name)
-        document.file_type = file_type
-        
-        if file_type == 'main':
-            _mark_nodes_origin(document.root, 'sdm')
-        
-        # APLICAR FILTRO HRIS (solo para archivos main)
-        if file_type == 'main':
-            filter_instance = create_hris_filter(filter_csf=False)
-            document = filter_instance.filter_document(document, file_type)
-        
-        documents.append(document)
+    # Cada archivo se parsea de forma independiente hasta la fusión; el parseo es
+    # Python puro, así que se reparte entre procesos (orden de files preservado)
+    workers = min(len(files), os.cpu_count() or 1)
+    if _should_parse_in_parallel(files, workers):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT) as executor:
+            documents = list(executor.map(_parse_one_file, files))
+    else:
+        documents = [_parse_one_file(file_info) for file_info in files]
     
     if len(documents) > 1:
         fused_document = _fuse_csf_with_main(documents)
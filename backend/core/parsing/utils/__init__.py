@@ -2,8 +2,11 @@ from .xml_merger import (
     _fuse_csf_with_main,
     _mark_nodes_origin
 )
+from .tree_stats import TreeStats, collect_tree_stats
 
 __all__ = [
     '_fuse_csf_with_main',
-    '_mark_nodes_origin'
+    '_mark_nodes_origin',
+    'TreeStats',
+    'collect_tree_stats'
 ]
\ No newline at end of file
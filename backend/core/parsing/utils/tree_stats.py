@@ -0,0 +1,49 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional, Set
+
+from ..models.xml_elements import XMLNode
+
+
+@dataclass
+class TreeStats:
+    """
+    Estadísticas de un árbol obtenidas en un único recorrido.
+    """
+    node_count: int = 0
+    tags: Set[str] = field(default_factory=set)
+    attribute_counts: Counter = field(default_factory=Counter)
+    language_counts: Counter = field(default_factory=Counter)
+
+
+def collect_tree_stats(root: Optional[XMLNode]) -> TreeStats:
+    """
+    Recorre el árbol una sola vez (pre-order iterativo) acumulando conteo de nodos,
+    tags, atributos y labels por idioma.
+
+    Los Counter conservan el orden de primera aparición del recorrido, igual que
+    las versiones recursivas a las que sustituye.
+    """
+    stats = TreeStats()
+    if root is None:
+        return stats
+
+    tags = stats.tags
+    attribute_counts = stats.attribute_counts
+    language_counts = stats.language_counts
+    node_count = 0
+    stack = [root]
+
+    while stack:
+        node = stack.pop()
+        node_count += 1
+        tags.add(node.tag)
+        if node.attributes:
+            attribute_counts.update(node.attributes.keys())
+        if node.labels:
+            language_counts.update(node.labels.keys())
+        if node.children:
+            stack.extend(reversed(node.children))
+
+    stats.node_count = node_count
+    return stats
@@ -18,24 +18,80 @@ def _fuse_csf_with_main(documents: List[XMLDocument]) -> XMLDocument:
     if not csf_docs:
         return main_doc
     
+    # Un solo recorrido del documento principal para todos los países de todos los CSF
+    country_index = _CountryIndex(main_doc.root)
+    
     for csf_doc in csf_docs:
-        main_doc = _merge_country_nodes(main_doc, csf_doc)
+        main_doc = _merge_country_nodes(main_doc, csf_doc, country_index)
     
     return main_doc
 
 
-def _merge_country_nodes(main_doc: XMLDocument, csf_doc: XMLDocument) -> XMLDocument:
+class _CountryIndex:
+    """
+    Código -> primer nodo país en pre-order del árbol principal: mismo resultado
+    que _find_country_by_code sin recorrer el árbol completo por cada país.
+    """
+    
+    def __init__(self, root: XMLNode):
+        self._root = root
+        self._index: Optional[Dict[Optional[str], XMLNode]] = None
+    
+    def find(self, country_code: str) -> Optional[XMLNode]:
+        if self._index is None:
+            self._index = {}
+            self._add_subtree(self._root)
+        return self._index.get(country_code)
+    
+    def add_appended_subtree(self, node: XMLNode):
+        """Registra un subárbol añadido al final del árbol (último en pre-order)."""
+        if self._index is not None:
+            self._add_subtree(node)
+    
+    def invalidate(self):
+        """Se reconstruye en la siguiente búsqueda (países añadidos en mitad del árbol)."""
+        self._index = None
+    
+    def _add_subtree(self, node: XMLNode):
+        index = self._index
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if 'country' in current.tag_lower:
+                code = current.technical_id or current.attributes.get('id')
+                if code not in index:
+                    index[code] = current
+            stack.extend(reversed(current.children))
+
+
+def _has_country_descendant(node: XMLNode) -> bool:
+    stack = list(node.children)
+    while stack:
+        current = stack.pop()
+        if 'country' in current.tag_lower:
+            return True
+        stack.extend(current.children)
+    return False
+
+
+def _merge_country_nodes(main_doc: XMLDocument,
+                         csf_doc: XMLDocument,
+                         country_index: Optional[_CountryIndex] = None) -> XMLDocument:
     csf_countries = _find_country_nodes(csf_doc.root)
     
     if not csf_countries:
         return main_doc
     
+    if country_index is None:
+        country_index = _CountryIndex(main_doc.root)
+    
     for country_node in csf_countries:
         _insert_country_into_main_with_origin(
             main_doc.root, 
             country_node, 
             csf_doc.source_name,
-            'csf'
+            'csf',
+            country_index
         )
     
     return main_doc
@@ -45,85 +101,120 @@ def _insert_country_into_main_with_origin(
     main_root: XMLNode, 
     country_node: XMLNode, 
     source_name: str,
-    origin: str = 'csf'
+    origin: str = 'csf',
+    country_index: Optional[_CountryIndex] = None
 ):
     country_code = country_node.technical_id or country_node.attributes.get('id', 'UNKNOWN')
-    existing_country = _find_country_by_code(main_root, country_code)
+    if country_index is not None:
+        existing_country = country_index.find(country_code)
+    else:
+        existing_country = _find_country_by_code(main_root, country_code)
     
     if existing_country:
         _merge_country_content_by_country(existing_country, country_node, country_code, origin)
+        # Si la fusión pudo añadir países dentro del árbol, el índice deja de valer
+        if country_index is not None and _has_country_descendant(country_node):
+            country_index.invalidate()
     else:
         cloned_country = _clone_node_with_origin(country_node, origin, country_code)
         cloned_country.parent = main_root
         cloned_country.depth = main_root.depth + 1
         cloned_country.sibling_order = len(main_root.children)
         main_root.children.append(cloned_country)
+        if country_index is not None:
+            country_index.add_appended_subtree(cloned_country)
 
 
 def _find_country_nodes(node: XMLNode) -> List[XMLNode]:
+    # Pre-order iterativo: mismo orden que el recorrido recursivo
     countries = []
+    stack = [node]
     
-    if 'country' in node.tag.lower():
-        countries.append(node)
-    
-    for child in node.children:
-        countries.extend(_find_country_nodes(child))
+    while stack:
+        current = stack.pop()
+        if 'country' in current.tag_lower:
+            countries.append(current)
+        stack.extend(reversed(current.children))
     
     return countries
 
 
 def _clone_node_with_origin(node: XMLNode, origin: str, country_code: str = None) -> XMLNode:
-    cloned = XMLNode(
-        tag=node.tag,
-        technical_id=node.technical_id,
-        attributes=node.attributes.copy(),
-        labels=node.labels.copy(),
-        children=[],
-        parent=None,
-        depth=node.depth,
-        sibling_order=node.sibling_order,
-        namespace=node.namespace,
-        text_content=node.text_content,
-        node_type=node.node_type
-    )
-    
-    if origin:
-        cloned.attributes['data-origin'] = origin
-    
-    if country_code:
-        cloned.attributes['data-country'] = country_code
-    
-    for child in node.children:
-        cloned_child = _clone_node_with_origin(child, origin, country_code)
-        cloned_child.parent = cloned
-        cloned.children.append(cloned_child)
-    
-    return cloned
+    # Recorrido iterativo: (nodo original, padre de la copia)
+    cloned_root = None
+    stack = [(node, None)]
+    
+    while stack:
+        current, cloned_parent = stack.pop()
+        cloned = current.copy_without_children()
+        
+        if origin:
+            cloned.attributes['data-origin'] = origin
+        
+        if country_code:
+            cloned.attributes['data-country'] = country_code
+        
+        if cloned_root is None:
+            cloned_root = cloned
+        else:
+            cloned.parent = cloned_parent
+            cloned_parent.children.append(cloned)
+        
+        stack.extend((child, cloned) for child in reversed(current.children))
+    
+    return cloned_root
 
 
 def _find_country_by_code(node: XMLNode, country_code: str) -> Optional[XMLNode]:
-    if 'country' in node.tag.lower():
-        current_code = node.technical_id or node.attributes.get('id')
-        if current_code == country_code:
-            return node
+    # Primer país con ese código en pre-order (recorrido iterativo)
+    stack = [node]
     
-    for child in node.children:
-        result = _find_country_by_code(child, country_code)
-        if result:
-            return result
+    while stack:
+        current = stack.pop()
+        if 'country' in current.tag_lower:
+            current_code = current.technical_id or current.attributes.get('id')
+            if current_code == country_code:
+                return current
+        stack.extend(reversed(current.children))
     
     return None
 
 
+def _is_hris_element(node: XMLNode) -> bool:
+    # tag_lower se calcula una vez por nodo: sin una copia en minúsculas por comprobación
+    tag_lower = node.tag_lower
+    return 'hris' in tag_lower and 'element' in tag_lower
+
+
+def _is_hris_field(node: XMLNode) -> bool:
+    tag_lower = node.tag_lower
+    return 'hris' in tag_lower and 'field' in tag_lower
+
+
 def _mark_nodes_origin(node: XMLNode, origin: str):
-    if 'data-origin' not in node.attributes:
-        node.attributes['data-origin'] = origin
+    # Recorrido iterativo: sin límite de recursión y con tag_lower ya precalculado
+    rename_hris = origin != 'sdm'
+    stack = [node]
     
-    if 'hris' in node.tag.lower() and node.technical_id and origin != 'sdm':
-        node.technical_id = f"{node.technical_id}_{origin}"
-    
-    for child in node.children:
-        _mark_nodes_origin(child, origin)
+    while stack:
+        current = stack.pop()
+        attributes = current.attributes
+        if 'data-origin' not in attributes:
+            attributes['data-origin'] = origin
+        
+        if rename_hris and current.technical_id and 'hris' in current.tag_lower:
+            current.technical_id = f"{current.technical_id}_{origin}"
+        
+        stack.extend(current.children)
+
+
+def _index_children_by_id(parent: XMLNode, predicate) -> Dict[Optional[str], XMLNode]:
+    # id -> primer hijo que cumple el predicado: lo que encontraba el recorrido lineal
+    index = {}
+    for child in parent.children:
+        if predicate(child):
+            index.setdefault(child.technical_id or child.attributes.get('id'), child)
+    return index
 
 
 def _merge_country_content_by_country(
@@ -132,16 +223,15 @@ def _merge_country_content_by_country(
     country_code: str,
     origin: str
 ):
+    existing_by_id = None
+    
     for new_element in new_country.children:
-        if 'hris' in new_element.tag.lower() and 'element' in new_element.tag.lower():
+        if _is_hris_element(new_element):
             element_id = new_element.technical_id or new_element.attributes.get('id')
             
-            existing_element = None
-            for child in existing_country.children:
-                if ('hris' in child.tag.lower() and 'element' in child.tag.lower() and
-                    (child.technical_id or child.attributes.get('id')) == element_id):
-                    existing_element = child
-                    break
+            if existing_by_id is None:
+                existing_by_id = _index_children_by_id(existing_country, _is_hris_element)
+            existing_element = existing_by_id.get(element_id)
             
             if existing_element:
                 _merge_element_fields_by_country(existing_element, new_element, country_code, origin)
@@ -155,6 +245,10 @@ def _merge_country_content_by_country(
                     _generate_country_based_ids(cloned_element, country_code, origin)
                 
                 existing_country.children.append(cloned_element)
+                existing_by_id.setdefault(
+                    cloned_element.technical_id or cloned_element.attributes.get('id'),
+                    cloned_element
+                )
 
 
 def _merge_element_fields_by_country(
@@ -163,22 +257,20 @@ def _merge_element_fields_by_country(
     country_code: str,
     origin: str
 ):
+    existing_by_id = None
+    
     for new_field in new_element.children:
-        if 'hris' in new_field.tag.lower() and 'field' in new_field.tag.lower():
+        if _is_hris_field(new_field):
             field_id = new_field.technical_id or new_field.attributes.get('id')
             
-            existing_field_found = False
-            for existing_field in existing_element.children:
-                if ('hris' in existing_field.tag.lower() and 'field' in existing_field.tag.lower() and
-                    (existing_field.technical_id or existing_field.attributes.get('id')) == field_id):
-                    
-                    if 'data-origin' not in existing_field.attributes:
-                        existing_field.attributes['data-origin'] = 'sdm'
-                    
-                    existing_field_found = True
-                    break
+            if existing_by_id is None:
+                existing_by_id = _index_children_by_id(existing_element, _is_hris_field)
+            existing_field = existing_by_id.get(field_id)
             
-            if not existing_field_found:
+            if existing_field is not None:
+                if 'data-origin' not in existing_field.attributes:
+                    existing_field.attributes['data-origin'] = 'sdm'
+            else:
                 cloned_field = _clone_node_with_origin(new_field, origin, country_code)
                 cloned_field.parent = existing_element
                 cloned_field.depth = existing_element.depth + 1
@@ -188,28 +280,33 @@ def _merge_element_fields_by_country(
                     _generate_country_based_ids(cloned_field, country_code, origin)
                 
                 existing_element.children.append(cloned_field)
+                existing_by_id.setdefault(
+                    cloned_field.technical_id or cloned_field.attributes.get('id'),
+                    cloned_field
+                )
 
 
 def _generate_country_based_ids(node: XMLNode, country_code: str, origin: str):
     if origin == 'sdm':
         return
     
-    current_id = node.technical_id or node.attributes.get('id', '')
-    
-    if not current_id:
-        return
-    
-    node.attributes['data-original-id'] = current_id
-    
-    if origin == 'csf':
-        full_id = f"{country_code}_{current_id}_{origin}"
-    else:
-        full_id = f"{country_code}_{current_id}"
-    
-    node.attributes['data-full-id'] = full_id
-    node.technical_id = full_id
+    # Prefijo y sufijo fijos para todo el subárbol; el elemento y sus hris-field
+    # se recorren con una pila en lugar de una llamada recursiva por campo
+    id_prefix = f"{country_code}_"
+    id_suffix = f"_{origin}" if origin == 'csf' else ''
+    stack = [node]
     
-    if 'hris' in node.tag.lower() and 'element' in node.tag.lower():
-        for child in node.children:
-            if 'hris' in child.tag.lower() and 'field' in child.tag.lower():
-                _generate_country_based_ids(child, country_code, origin)
\ No newline at end of file
+    while stack:
+        current = stack.pop()
+        current_id = current.technical_id or current.attributes.get('id', '')
+        
+        if not current_id:
+            continue
+        
+        full_id = f"{id_prefix}{current_id}{id_suffix}"
+        current.attributes['data-original-id'] = current_id
+        current.attributes['data-full-id'] = full_id
+        current.technical_id = full_id
+        
+        if _is_hris_element(current):
+            stack.extend(child for child in reversed(current.children) if _is_hris_field(child))
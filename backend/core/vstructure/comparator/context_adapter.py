@@ -4,10 +4,12 @@ Adaptador entre metadata XML y contexto de validación.
 Lee metadata desde el PICKLE (document.pkl) que contiene XMLDocument.
 """
 
-import pickle
 import json
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import sys
 
 # Intentar importar los tipos de parsing si están disponibles
@@ -17,9 +19,16 @@ try:
 except ImportError:
     PARSING_AVAILABLE = False
 
+from ...parsing.metadata_manager import load_document_file
 from .models import MetadataContext, EntityMetadata, FieldMetadata
 from .errors import ComparatorErrors
 
+# Contextos ya adaptados por (instancia, versión, archivos y sus mtime). Se
+# comparten entre llamadas: la validación solo los lee
+_CONTEXT_CACHE_SIZE = 32
+_context_cache: "OrderedDict[Tuple, MetadataContext]" = OrderedDict()
+_context_cache_lock = threading.Lock()
+
 
 class MetadataAdapter:
     """Adapta metadata XMLDocument al formato necesario para validación."""
@@ -120,53 +129,73 @@ class MetadataAdapter:
         if version:
             version_path = instance_path / version
         else:
-            # Encontrar última versión
+            # Encontrar última versión: un solo scandir, is_dir() usa el tipo
+            # que ya trae cada DirEntry en lugar de un stat() por entrada
+            with os.scandir(instance_path) as entries:
+                all_dirs = [entry.name for entry in entries if entry.is_dir()]
+            
             version_dirs = sorted([
-                d for d in instance_path.iterdir() 
-                if d.is_dir() and any(f"_v{i}" in d.name for i in range(1, 10))
+                name for name in all_dirs
+                if any(f"_v{i}" in name for i in range(1, 10))
             ], reverse=True)
             
             if not version_dirs:
-                version_dirs = sorted([d for d in instance_path.iterdir() if d.is_dir()], reverse=True)
+                version_dirs = sorted(all_dirs, reverse=True)
             
             if not version_dirs:
                 raise FileNotFoundError(f"No hay versiones en instancia: {instance_id}")
             
-            version_path = version_dirs[0]
-            version = version_path.name
+            version = version_dirs[0]
+            version_path = instance_path / version
         
         print(f"   ✓ Versión encontrada: {version_path}")
         
-        # Cargar metadata.json para información
+        # Localizar metadata.json (informativo) y document.pkl sin leerlos todavía
         metadata_file = version_path / f"metadata_{instance_id}.json"
-        metadata_info = {}
-        if metadata_file.exists():
-            print(f"   Cargando metadata info: {metadata_file.name}")
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                metadata_info = json.load(f)
-        else:
+        if not metadata_file.exists():
             # Intentar cualquier archivo metadata_*.json
             metadata_files = list(version_path.glob("metadata_*.json"))
-            if metadata_files:
-                metadata_file = metadata_files[0]
-                print(f"   Cargando metadata info alternativo: {metadata_file.name}")
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata_info = json.load(f)
+            metadata_file = metadata_files[0] if metadata_files else None
         
         # Cargar document.pkl (XMLDocument serializado)
-        pickle_file = version_path / f"document_{instance_id}.pkl"
+        pickle_file = version_path / f"document_{instance_id}.pkl.zst"
+        if not pickle_file.exists():
+            pickle_file = version_path / f"document_{instance_id}.pkl"
         if not pickle_file.exists():
-            # Intentar cualquier document_*.pkl
-            pickle_files = list(version_path.glob("document_*.pkl"))
+            # Intentar cualquier document_*.pkl (comprimido o no)
+            pickle_files = (list(version_path.glob("document_*.pkl.zst"))
+                            or list(version_path.glob("document_*.pkl")))
             if pickle_files:
                 pickle_file = pickle_files[0]
             else:
                 raise FileNotFoundError(f"Archivo pickle no encontrado en: {version_path}")
         
+        # Los mtime invalidan la entrada si se reescribe alguno de los dos archivos
+        cache_key = (
+            instance_id,
+            version,
+            str(pickle_file),
+            os.stat(pickle_file).st_mtime_ns,
+            str(metadata_file) if metadata_file else None,
+            os.stat(metadata_file).st_mtime_ns if metadata_file else None
+        )
+        with _context_cache_lock:
+            cached = _context_cache.get(cache_key)
+            if cached is not None:
+                _context_cache.move_to_end(cache_key)
+        if cached is not None:
+            print(f"   ✓ Metadata en caché: {pickle_file.name}")
+            return cached
+        
+        metadata_info = {}
+        if metadata_file:
+            print(f"   Cargando metadata info: {metadata_file.name}")
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata_info = json.load(f)
+        
         print(f"   Leyendo pickle: {pickle_file.name}")
         
-        with open(pickle_file, 'rb') as f:
-            xml_document = pickle.load(f)
+        xml_document = load_document_file(pickle_file)
         
         # Crear contexto de metadata
         metadata_context = MetadataContext(
@@ -181,6 +210,12 @@ class MetadataAdapter:
         print(f"   ✓ Metadata cargada: {len(metadata_context.entities)} entidades, "
               f"{len(metadata_context.field_by_full_path)} campos")
         
+        with _context_cache_lock:
+            _context_cache[cache_key] = metadata_context
+            _context_cache.move_to_end(cache_key)
+            while len(_context_cache) > _CONTEXT_CACHE_SIZE:
+                _context_cache.popitem(last=False)
+        
         return metadata_context
     @classmethod
     def _extract_from_xml_document(
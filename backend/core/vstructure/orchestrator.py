@@ -317,13 +317,15 @@ class ValidationOrchestrator:
             files_in_version = list(version_path.glob("*"))
             print(f"   Archivos en versión: {[f.name for f in files_in_version]}")
             
-            # CORRECCIÓN: Cargar el archivo PICKLE (XMLDocument serializado)
-            pickle_file_pattern = f"document_{instance_id}.pkl"
-            pickle_file = version_path / pickle_file_pattern
+            # CORRECCIÓN: Cargar el archivo PICKLE (XMLDocument serializado, .pkl o .pkl.zst)
+            pickle_file = version_path / f"document_{instance_id}.pkl.zst"
+            if not pickle_file.exists():
+                pickle_file = version_path / f"document_{instance_id}.pkl"
             
-            # Si no existe con el patrón, buscar cualquier document_*.pkl
+            # Si no existe con el patrón, buscar cualquier document_*.pkl / document_*.pkl.zst
             if not pickle_file.exists():
-                pickle_files = list(version_path.glob("document_*.pkl"))
+                pickle_files = (list(version_path.glob("document_*.pkl.zst"))
+                                or list(version_path.glob("document_*.pkl")))
                 if pickle_files:
                     pickle_file = pickle_files[0]
                     print(f"   Usando archivo pickle alternativo: {pickle_file.name}")
@@ -333,9 +335,8 @@ class ValidationOrchestrator:
             print(f"   Cargando PICKLE: {pickle_file}")
             
             # Cargar el objeto XMLDocument serializado
-            import pickle
-            with open(pickle_file, 'rb') as f:
-                xml_document = pickle.load(f)
+            from ..parsing.metadata_manager import load_document_file
+            xml_document = load_document_file(pickle_file)
             
             # Ahora necesitamos convertir el XMLDocument a un diccionario
             # que pueda ser procesado por MetadataAdapter.adapt_parsed_metadata
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from backend.core.parsing import metadata_manager
+from backend.core.parsing.orchestrator import XMLParsingOrchestrator
+
+
+MODEL = """<?xml version="1.0" encoding="UTF-8"?>
+<root><hris-element id="personalInfo"><hris-field id="firstName"/></hris-element></root>
+"""
+
+
+class _FailingNormalizer:
+    """Normalizador que falla, opcionalmente después de que el guardado termine."""
+
+    def __init__(self, after_save: bool):
+        self.after_save = after_save
+
+    def normalize_document(self, document):
+        if self.after_save:
+            # La cola de guardados es FIFO de un hilo: al volver, el guardado ya terminó
+            metadata_manager._SAVE_QUEUE.submit(lambda: None).result()
+        raise RuntimeError("normalization failed")
+
+
+class StoreAndNormalizeTest(unittest.TestCase):
+    """Una normalización fallida no debe dejar una versión guardada."""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        self.xml_path = Path(self._tmp.name) / "model.xml"
+        self.xml_path.write_text(MODEL, encoding="utf-8")
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def _assert_no_version_left(self, after_save: bool):
+        orchestrator = XMLParsingOrchestrator(id="failing")
+        orchestrator.normalizer = _FailingNormalizer(after_save)
+
+        with self.assertRaises(RuntimeError):
+            orchestrator.parse_and_store(self.xml_path, "failing")
+        with self.assertRaises(RuntimeError):
+            orchestrator.parse_fuse_and_store(self.xml_path, "failing")
+
+        id_dir = metadata_manager._METADATA_BASE / "failing"
+        versions = [d for d in id_dir.iterdir() if d.is_dir()] if id_dir.exists() else []
+        self.assertEqual(versions, [])
+
+    def test_failure_before_save_runs(self):
+        self._assert_no_version_left(after_save=False)
+
+    def test_failure_after_save_finished(self):
+        self._assert_no_version_left(after_save=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from backend.core.parsing.filters.xml_filter import create_hris_filter
+from backend.core.parsing.loaders.xml_loader import XMLLoader
+from backend.core.parsing.parsers.xml_parser import XMLParser
+
+
+DUPLICATED_BY_NAME_AND_CODE = """<?xml version="1.0" encoding="UTF-8"?>
+<root>
+  <foo>
+    <element-permission name="homeAddress">
+      <bar><baz id="q"/></bar>
+      <hris-field id="street"><label>Street</label></hris-field>
+    </element-permission>
+  </foo>
+  <hris-element id="addressInfo">
+    <element-permission name="homeAddress">
+      <bar><baz/></bar>
+      <hris-field id="zip"><label>Zip</label></hris-field>
+    </element-permission>
+    <element-permission code="workPermitInfo">
+      <other/>
+      <hris-field id="document"><label>Document</label></hris-field>
+    </element-permission>
+  </hris-element>
+  <hris-element name="homeAddress"><junk/><hris-field id="city"/></hris-element>
+</root>
+"""
+
+
+def _dump(node, path="r"):
+    """Aplana el árbol con todos los campos que comparan los dos caminos de parseo."""
+    if node is None:
+        return [None]
+    rows = [(path, node.tag, node.technical_id, sorted(node.attributes.items()),
+             sorted(node.labels.items()), node.depth, node.sibling_order,
+             node.namespace, node.text_content, node.node_type)]
+    for index, child in enumerate(node.children):
+        assert child.parent is node
+        rows.extend(_dump(child, f"{path}/{index}"))
+    return rows
+
+
+class StreamingFilterTest(unittest.TestCase):
+    """El filtrado durante el streaming debe coincidir con filter_document."""
+
+    def _assert_same_as_filter_document(self, xml: str):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "model.xml"
+            path.write_text(xml, encoding="utf-8")
+
+            node_filter = create_hris_filter()
+            expected = node_filter.filter_document(
+                XMLParser().parse_document(XMLLoader.load_from_file(path), "model")
+            )
+            streamed = XMLParser().parse_file(path, "model", node_filter)
+
+        self.assertEqual(_dump(expected.root), _dump(streamed.root))
+
+    def test_duplicated_elements_keyed_by_name_or_code(self):
+        self._assert_same_as_filter_document(DUPLICATED_BY_NAME_AND_CODE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from backend.core.parsing.loaders.xml_loader import XMLLoader
+from backend.core.parsing.models.xml_elements import NodeType
+from backend.core.parsing.parsers.xml_parser import XMLParser
+
+
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+MODEL = """<?xml version="1.0" encoding="UTF-8"?>
+<root>
+  <hris-element xml:lang="es-MX" visibility="both"><label>Datos</label></hris-element>
+</root>
+"""
+
+
+class NamespacedAttributesTest(unittest.TestCase):
+    """Los atributos con namespace conservan la clasificación y los labels."""
+
+    def setUp(self):
+        document = XMLParser().parse_document(ET.fromstring(MODEL), "model")
+        self.node = document.root.children[0]
+
+    def test_keeps_namespaced_and_local_keys(self):
+        self.assertEqual(self.node.attributes[XML_LANG], "es-MX")
+        self.assertEqual(self.node.attributes["lang"], "es-MX")
+
+    def test_namespace_uri_counts_as_field_indicator(self):
+        # La URI del namespace xml contiene 'name'
+        self.assertEqual(self.node.node_type, NodeType.FIELD)
+
+
+LANG_URI_MODEL = """<?xml version="1.0" encoding="UTF-8"?>
+<root xmlns:l="http://x.com/language">
+  <hris-element id="customInfo">
+    <note l:code="x">Datos personales</note>
+    <hris-field id="firstName"/>
+  </hris-element>
+</root>
+"""
+
+
+class LabelElementTest(unittest.TestCase):
+    """Un atributo cuya URI de namespace contiene 'lang' marca el elemento como label."""
+
+    def _assert_absorbed_as_label(self, root):
+        element = root.children[0]
+        self.assertEqual([child.tag for child in element.children], ["hris-field"])
+        self.assertEqual(element.children[0].sibling_order, 0)
+
+    def test_dom_parse(self):
+        document = XMLParser().parse_document(ET.fromstring(LANG_URI_MODEL), "model")
+        self._assert_absorbed_as_label(document.root)
+
+    def test_streaming_parse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "model.xml"
+            path.write_text(LANG_URI_MODEL, encoding="utf-8")
+            document = XMLParser().parse_document_streaming(
+                XMLLoader.iterparse_file(path, "model"), "model"
+            )
+        self._assert_absorbed_as_label(document.root)
+
+
+if __name__ == "__main__":
+    unittest.main()